@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Benchmark do caminho quente do Bot Escanteios RP VIP Plus (fora do módulo do bot).
+
+Custo de CPU por jogo que pagamos em todo tick, medido sobre payloads no formato da
+API-Football (live=all + /fixtures/statistics). Saída em µs/jogo, comparável a um baseline.
+Não acessa a rede: roda sem API_FOOTBALL_KEY/TOKEN/TELEGRAM_CHAT_ID (valores fictícios só
+para o import), então serve de gate no CI.
+
+Uso: `python bench.py [--salvar ARQ] [--comparar ARQ] [--tolerancia 0.25] [--repeticoes N]`
+     mede 50/500/5000 jogos por tick, grava baseline JSON e sai com 1 se houver regressão.
+     `python bench.py lote` roda paridade escalar×lote e throughput (100/1k/10k jogos).
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# offline: o import do bot exige credenciais, o benchmark não usa nenhuma
+for _var, _valor in (("API_FOOTBALL_KEY", "bench"), ("TOKEN", "bench"), ("TELEGRAM_CHAT_ID", "0")):
+    os.environ.setdefault(_var, _valor)
+
+import bot_escanteios_rp_vip_plus_multi_v2_economico as bot
+
+# ===================== CAMINHO QUENTE =====================
+BENCH_TAMANHOS = (50, 500, 5000)
+BENCH_BASELINE = "bench_hot_path.json"
+BENCH_ID_BASE = 900_000_000   # ids sintéticos fora da faixa real (não colidem no registro)
+
+def _payload_sintetico(n: int, seed: int = 11) -> Tuple[List[Dict[str, Any]], List[List[Dict[str, Any]]]]:
+    """Fixtures e respostas de statistics como a API devolve (rótulos extras, '%' e None inclusos)."""
+    rng = np.random.default_rng(seed)
+    fixtures, stats_resps = [], []
+    for i in range(n):
+        fid = BENCH_ID_BASE + i
+        minute = int(rng.integers(19, 94))
+        fixtures.append({
+            "fixture": {"id": fid, "status": {"short": "1H" if minute <= 45 else "2H", "elapsed": minute},
+                        "venue": {"name": "Turf Moor" if i % 5 == 0 else f"Arena {i}"}},
+            "league": {"id": 39 + i % 40, "name": "Premier League" if i % 9 else "Serie A U21", "season": 2025},
+            "teams": {"home": {"id": fid * 2, "name": f"Home_{i} F.C. (Res.)"},
+                      "away": {"id": fid * 2 + 1, "name": f"Away-{i} *SC*"}},
+            "goals": {"home": int(rng.integers(0, 4)), "away": int(rng.integers(0, 4))},
+        })
+        resp = []
+        for tid in (fid * 2, fid * 2 + 1):
+            pos = int(rng.integers(25, 76))
+            resp.append({"team": {"id": tid, "name": "?"}, "statistics": [
+                {"type": "Shots on Goal", "value": int(rng.integers(0, 8))},
+                {"type": "Shots off Goal", "value": int(rng.integers(0, 8))},
+                {"type": "Total Shots", "value": int(rng.integers(0, 20))},
+                {"type": "Blocked Shots", "value": int(rng.integers(0, 5))},
+                {"type": "Shots insidebox", "value": int(rng.integers(0, 10))},
+                {"type": "Shots outsidebox", "value": int(rng.integers(0, 8))},
+                {"type": "Fouls", "value": int(rng.integers(0, 15))},
+                {"type": "Corner Kicks", "value": int(rng.integers(0, 13))},
+                {"type": "Offsides", "value": None},
+                {"type": "Ball Possession", "value": f"{pos}%"},
+                {"type": "Yellow Cards", "value": int(rng.integers(0, 4))},
+                {"type": "Red Cards", "value": None},
+                {"type": "Goalkeeper Saves", "value": int(rng.integers(0, 6))},
+                {"type": "Total passes", "value": int(rng.integers(100, 600))},
+                {"type": "Passes accurate", "value": int(rng.integers(80, 500))},
+                {"type": "Passes %", "value": f"{int(rng.integers(60, 92))}%"},
+                {"type": "Attacks", "value": int(rng.integers(0, 80))},
+                {"type": "Dangerous Attacks", "value": int(rng.integers(0, 50))},
+                {"type": "expected_goals", "value": f"{rng.uniform(0, 3):.2f}"},
+            ]})
+        stats_resps.append(resp)
+    return fixtures, stats_resps
+
+def _medir(fn, repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+def benchmark_hot_path(tamanhos: Tuple[int, ...] = BENCH_TAMANHOS, repeticoes: int = 5) -> Dict[str, Any]:
+    """Melhor de N execuções, em µs por jogo, para cada função do caminho quente e tamanho de tick."""
+    resultados: Dict[str, Dict[str, float]] = {}
+    nivel = bot.logger.level
+    bot.logger.setLevel(logging.INFO)  # o debug do Composite distorce a medição
+    bot.begin_scan_context()           # eventos pré-carregados no memo: a mensagem não vai à rede
+    try:
+        for n in tamanhos:
+            fixtures, stats_resps = _payload_sintetico(n)
+            minutos = [float(fx["fixture"]["status"]["elapsed"]) for fx in fixtures]
+            stats = [bot.extract_basic_stats(fx, sr) for fx, sr in zip(fixtures, stats_resps)]
+            metrics = [bot.montar_metricas_vip(fx, m, h, a) for fx, m, (h, a) in zip(fixtures, minutos, stats)]
+            enriquecidos = []
+            for fx, m in zip(fixtures, metrics):
+                fid = fx["fixture"]["id"]
+                bot._scan_memo_put(f"{bot.API_BASE}/fixtures/events", {"fixture": fid},
+                               {"response": [{"time": {"elapsed": 10, "extra": None}}] * 9})
+                enriquecidos.append({**m, "home_rank": "3º", "away_rank": "11º", "home_posse": "55",
+                                     "away_posse": "45", "dados_verificados": True})
+            nomes = [fx["teams"]["home"]["name"] for fx in fixtures]
+            estrategias = ["HT - Cantos Limite 1º Tempo", "Jogo Vivo Sem Cantos"]
+
+            casos = {
+                "projetar_fixture": lambda: [bot.projetar_fixture(fx) for fx in fixtures],
+                "extract_basic_stats": lambda: [bot.extract_basic_stats(fx, sr) for fx, sr in zip(fixtures, stats_resps)],
+                "pressure_score_vip": lambda: [bot.pressure_score_vip(h, a) for h, a in stats],
+                "verificar_estrategias_vip": lambda: [bot.verificar_estrategias_vip(fx, m) for fx, m in zip(fixtures, metrics)],
+                "smooth_minute": lambda: [bot.smooth_minute(fx["fixture"]["id"], m) for fx, m in zip(fixtures, minutos)],
+                "get_period_by_window": lambda: [bot.get_period_by_window(m) for m in minutos],
+                "escape_markdown": lambda: [bot.escape_markdown(nome) for nome in nomes],
+                "formatar_mensagem_vip_nasa": lambda: [bot.formatar_mensagem_vip_nasa(fx, estrategias, dict(st))
+                                                       for fx, st in zip(fixtures, enriquecidos)],
+            }
+            for nome, fn in casos.items():
+                resultados.setdefault(nome, {})[str(n)] = _medir(fn, repeticoes) / n * 1e6
+    finally:
+        bot.end_scan_context()
+        bot.logger.setLevel(nivel)
+        with bot._fixture_states_lock:
+            for fid in [f for f in bot._fixture_states if f >= BENCH_ID_BASE]:
+                del bot._fixture_states[fid]
+    return {"unidade": "us_por_jogo", "repeticoes": repeticoes, "python": sys.version.split()[0],
+            "gerado_em": datetime.now().isoformat(timespec="seconds"), "resultados": resultados}
+
+def comparar_benchmark(atual: Dict[str, Any], baseline: Dict[str, Any],
+                       tolerancia: float = 0.25) -> List[Dict[str, Any]]:
+    """Linha por função×tamanho com a razão atual/baseline; regressao=True acima de 1+tolerancia."""
+    linhas = []
+    for nome, por_n in atual["resultados"].items():
+        for n, us in por_n.items():
+            base = (baseline.get("resultados", {}).get(nome) or {}).get(n)
+            razao = (us / base) if base else None
+            linhas.append({"funcao": nome, "n": int(n), "atual_us": us, "baseline_us": base, "razao": razao,
+                           "regressao": razao is not None and razao > 1 + tolerancia})
+    return linhas
+
+def rodar_bench_cli(args: List[str]) -> int:
+    """`[--salvar ARQ] [--comparar ARQ] [--tolerancia X] [--repeticoes N]`. Sai com 1 se houver regressão."""
+    opcoes = {"--salvar": None, "--comparar": None, "--tolerancia": "0.25", "--repeticoes": "5"}
+    for i, arg in enumerate(args):
+        if arg in opcoes and i + 1 < len(args):
+            opcoes[arg] = args[i + 1]
+    atual = benchmark_hot_path(repeticoes=int(opcoes["--repeticoes"]))
+    baseline = None
+    if opcoes["--comparar"]:
+        with open(opcoes["--comparar"], "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    linhas = comparar_benchmark(atual, baseline or {}, float(opcoes["--tolerancia"]))
+    for ln in linhas:
+        base = f"{ln['baseline_us']:>10.2f}" if ln["baseline_us"] else f"{'—':>10}"
+        razao = f"{ln['razao']:.2f}x" if ln["razao"] else "—"
+        marca = "  ⚠️ REGRESSÃO" if ln["regressao"] else ""
+        print(f"{ln['funcao']:<28} n={ln['n']:>5} | {ln['atual_us']:>10.2f} µs/jogo | baseline {base} | {razao}{marca}")
+    if opcoes["--salvar"]:
+        with open(opcoes["--salvar"], "w", encoding="utf-8") as f:
+            json.dump(atual, f, ensure_ascii=False, indent=2)
+        print(f"Baseline gravado em {opcoes['--salvar']}")
+    return 1 if any(ln["regressao"] for ln in linhas) else 0
+
+# ===================== PONTUAÇÃO EM LOTE (NumPy) × ESCALAR =====================
+def lote_sintetico(n: int, seed: int = 7) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Jogos sintéticos com faixas realistas (inclui empates de limiar e stats zeradas)."""
+    rng = np.random.default_rng(seed)
+    fixtures, metrics_list = [], []
+    for i in range(n):
+        hp = int(rng.integers(25, 76))
+        home: bot.TeamStats = {'corners': int(rng.integers(0, 13)), 'attacks': int(rng.integers(0, 80)),
+                               'danger': int(rng.integers(0, 50)), 'shots': int(rng.integers(0, 20)), 'pos': hp}
+        away: bot.TeamStats = {'corners': int(rng.integers(0, 13)), 'attacks': int(rng.integers(0, 80)),
+                               'danger': int(rng.integers(0, 50)), 'shots': int(rng.integers(0, 20)), 'pos': 100 - hp}
+        if i % 17 == 0:
+            away['attacks'] = home['attacks'] = 0
+        fx = {'fixture': {'id': i, 'venue': {'name': 'Turf Moor' if i % 5 == 0 else 'Arena'}},
+              'goals': {'home': int(rng.integers(0, 4)), 'away': int(rng.integers(0, 4))}}
+        minute = round(float(rng.uniform(18.0, 95.0)), 1)
+        fixtures.append(fx)
+        metrics_list.append(bot.montar_metricas_vip(fx, minute, home, away))
+    return fixtures, metrics_list
+
+def verificar_paridade_lote(n: int = 5000, seed: int = 7) -> int:
+    """Compara escalar × lote em N jogos sintéticos. Retorna o número de divergências."""
+    fixtures, metrics_list = lote_sintetico(n, seed)
+    cols = bot.empacotar_lote_vip(fixtures, metrics_list)
+    _, _, ph, pa = bot.verificar_estrategias_batch(cols)
+    lote = bot.avaliar_lote_vip(fixtures, metrics_list)
+    divergencias = 0
+    for i, (fx, m) in enumerate(zip(fixtures, metrics_list)):
+        if (ph[i], pa[i]) != (m['press_home'], m['press_away']) or lote[i] != bot.verificar_estrategias_vip(fx, m):
+            divergencias += 1
+    return divergencias
+
+def benchmark_lote_vip(tamanhos: Tuple[int, ...] = (100, 1000, 10000), repeticoes: int = 5) -> List[Dict[str, Any]]:
+    """Throughput escalar × lote (jogos/s) para cada tamanho de lote."""
+    resultados = []
+    nivel = bot.logger.level
+    bot.logger.setLevel(logging.INFO)  # o debug do Composite distorce a medição escalar
+    try:
+        for n in tamanhos:
+            fixtures, metrics_list = lote_sintetico(n)
+            t0 = time.perf_counter()
+            for _ in range(repeticoes):
+                for fx, m in zip(fixtures, metrics_list):
+                    bot.verificar_estrategias_vip(fx, m)
+            escalar = (time.perf_counter() - t0) / repeticoes
+            t0 = time.perf_counter()
+            for _ in range(repeticoes):
+                bot.avaliar_lote_vip(fixtures, metrics_list)
+            lote = (time.perf_counter() - t0) / repeticoes
+            cols = bot.empacotar_lote_vip(fixtures, metrics_list)
+            t0 = time.perf_counter()
+            for _ in range(repeticoes):
+                bot.verificar_estrategias_batch(cols)
+            nucleo = (time.perf_counter() - t0) / repeticoes
+            resultados.append({"n": n, "escalar_s": escalar, "lote_s": lote, "nucleo_s": nucleo,
+                               "escalar_jogos_s": n / escalar, "lote_jogos_s": n / lote,
+                               "nucleo_jogos_s": n / nucleo})
+    finally:
+        bot.logger.setLevel(nivel)
+    return resultados
+
+def rodar_bench_lote() -> int:
+    print(f"Paridade escalar × lote (5000 jogos): {verificar_paridade_lote()} divergências")
+    for r in benchmark_lote_vip():
+        print(f"n={r['n']:>6} | escalar {r['escalar_jogos_s']:>12,.0f} jogos/s | "
+              f"lote (com empacotamento) {r['lote_jogos_s']:>12,.0f} jogos/s | "
+              f"núcleo vetorizado {r['nucleo_jogos_s']:>14,.0f} jogos/s")
+    return 0
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "lote":
+        sys.exit(rodar_bench_lote())
+    sys.exit(rodar_bench_cli(sys.argv[1:]))
@@ -7,28 +7,102 @@ Bot Escanteios RP VIP Plus — Multi v2 (Econômico) • ULTRA Sensível v3.2.2
 - Backoff quando a API não retorna estatísticas (economia de cota)
 - Mantém TODAS as estratégias e layout VIP sem Poisson
 - /status e /debug via webhook do Telegram
+- GET /metrics no formato texto do Prometheus (latência/status por endpoint, cota, varredura, sinais, Telegram)
 
 ENV:
 - API_FOOTBALL_KEY, TOKEN, TELEGRAM_CHAT_ID, (opcional) TELEGRAM_ADMIN_ID
+- API_FOOTBALL_KEYS (opcional, separadas por vírgula): chaves extras no pool; cada chamada vai para a
+  chave com mais folga (x-ratelimit-* por chave). 429 tira a chave de rotação por 60s (ou até a virada
+  do dia se a cota diária zerou); 401/403 por API_KEY_AUTH_COOLDOWN (default 900s)
+- SUBSCRIBERS_FILE (default assinantes.json): lista de chats que recebem os sinais, cada um com filtros
+  próprios, p.ex. [{"chat_id": "-100123", "nome": "VIP HT", "periodos": ["HT"], "ligas": [39, 71],
+  "min_estrategias": 2, "template": "vip" | "compacto"}]. Sem o arquivo, os sinais vão só para
+  TELEGRAM_CHAT_ID (status/relatórios continuam lá). Relido quando o arquivo muda
 - SCAN_INTERVAL (default 45), RENOTIFY_MINUTES (default 3)
+- STATS_MAX_INFLIGHT (default 8): máx. de requisições de stats simultâneas por varredura
+- STATS_BATCH (default 1; 0 desliga): stats ao vivo via /fixtures?ids= (20 jogos por chamada, com
+  statistics/events embutidos); o caminho por jogo (/fixtures/statistics) fica como fallback
+- HTTP_POOL_API / HTTP_POOL_TELEGRAM: conexões keep-alive por host (default: STATS_MAX_INFLIGHT+2 / 4)
+- ENRICH_CACHE_TTL (default 14400s) / ENRICH_CACHE_MAX (default 256): cache de standings por (liga, temporada)
+- SCAN_INTERVAL_MAX (default 900), API_MINUTE_LIMIT (default 30, até os headers chegarem),
+  QUOTA_RESERVE (default 0.05 da cota diária guardada para comandos/liquidação)
+- POLL_URGENT_MIN (default 3), POLL_GAP_FACTOR (default 0.25), POLL_MAX_GAP (default 120s),
+  STATS_MAX_PER_TICK (default 0 = sem teto): prioridade de polling por proximidade do fim da janela
+- FIXTURE_STATE_MAX (default 2000) / FIXTURE_STATE_GRACE (default 300s): registro por jogo com despejo
+- LEAGUE_ALLOW / LEAGUE_DENY (ids de liga separados por vírgula): com LEAGUE_ALLOW o live=all vira
+  live=id-id-... (a API já devolve só essas ligas); LEAGUE_DENY é aplicado localmente
+- LEAGUE_SKIP_RESERVE (default 1; 0 volta a sinalizar com aviso): ligas de reservas/sub-XX/femininas/
+  amistosos saem da varredura antes de qualquer chamada de stats
+- STATE_SNAPSHOT_PATH (default estado_scanner.json.gz), STATE_SNAPSHOT_INTERVAL (default 60s),
+  STATE_SNAPSHOT_MAX_AGE (default 10800s): registro por jogo salvo de forma atômica e recarregado no boot
+  (sem sinal duplicado nem refetch após restart); tempo até a 1ª varredura útil vai para /debug e /metrics
+- MOMENTUM_WINDOW (default 8 min) / MOMENTUM_SLOTS (default 16): série curta de stats por jogo para o
+  ritmo recente (cantos, ataques perigosos e chutes nos últimos N minutos)
+- TELEGRAM_OUTBOX_WORKERS (default 2), TELEGRAM_OUTBOX_MAX (default 500), TELEGRAM_MAX_RETRIES (default 5),
+  TELEGRAM_GLOBAL_RATE (default 25 msg/s): fila de envio assíncrona para o Telegram
+- SIGNALS_DB_PATH (default sinais.db): SQLite (WAL) dos sinais; relatorio.csv antigo é importado uma vez
+- HIST_DIR (default historico_sinais/), HIST_INDEX_DAYS (default 3), HIST_COMPACT_INTERVAL (default 3600s):
+  histórico VIP NASA em JSONL append-only por dia
+- SETTLE_INTERVAL (default 120s; 0 desliga): liquidação automática (GREEN/RED) dos sinais pendentes;
+  SETTLE_MAX_AGE (default 21600s): pendente mais velho que isso (jogo que a API não devolve ou sem
+  cantos) vira ANULADO e sai da fila
+- BATCH_SCORING_MIN (default 1000; 0 desliga): a partir de N jogos com stats, pontua o lote em NumPy
+  (abaixo disso o custo de empacotar os dicts supera o ganho do núcleo vetorizado)
+
+- TRACE_TICKS (default 50): ticks recentes com tempo por etapa (ring buffer; /trace e GET /admin/trace)
+- ADMIN_TOKEN: habilita as rotas /admin/* (header X-Admin-Token ou ?token=); PROFILE_DIR (default perfis/)
+  guarda os .prof do /profile N (comando do TELEGRAM_ADMIN_ID ou POST /admin/profile?ticks=N)
+- PROCESS_MODE (default single): single = scanner + Flask no mesmo processo; split = processo web
+  (WSGI multi-thread: webhook, /health, /metrics) + processo scanner, ligados por uma fila de comandos
+  (multiprocessing) e pelo arquivo STATUS_SNAPSHOT_PATH (default status_scanner.json). SIGTERM encerra
+  os dois de forma limpa (snapshot do registro salvo, fila do Telegram drenada)
+- BOT_MODE (default live): live | record | replay
+  record: grava toda resposta da API-Football (safe_request/_read_json_fast) com o instante em
+          RECORD_DIR/api-AAAAMMDD-HHMMSS.jsonl.gz (RECORD_DIR default gravacoes/)
+  replay: serve REPLAY_FILE ao pipeline sem rede, Telegram desligado, relógio REPLAY_SPEED vezes
+          mais rápido (ex.: 10–100); API_FOOTBALL_KEY/TOKEN/TELEGRAM_CHAT_ID passam a ser opcionais.
+          Sinais, histórico e relatório vão para REPLAY_DIR (default replay_saida/), nunca para
+          SIGNALS_DB_PATH/HIST_DIR de produção
+
+Benchmarks: bench.py (ao lado deste arquivo; sem rede nem credenciais). `python bench.py` mede o custo
+     por jogo do caminho quente e compara com um baseline; `python bench.py lote` roda paridade e
+     throughput escalar×lote.
 """
 
 import os
 import re
+import sys
 import time
 import math
 import logging
+import heapq
+import queue
 import threading
 import urllib.parse
-from collections import defaultdict, Counter
-from typing import Dict, Any, List, Optional, Tuple
-from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, OrderedDict, deque
+from typing import Dict, Any, List, Optional, Tuple, TypedDict
+from datetime import datetime, date, timezone, timedelta
 import pytz
 import csv
 import html
-
+import json
+import sqlite3
+import gzip
+import bisect
+import atexit
+import cProfile
+import signal
+import multiprocessing
+from array import array
+import io
+import pstats
+
+import numpy as np
 import requests
-from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from flask import Flask, Response, request, jsonify, send_from_directory, abort
 
 # ========================= LOG / ENV =========================
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
@@ -36,28 +110,106 @@ logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s:%(name)s:
 logger = logging.getLogger('bot_escanteios_rp_vip_multi_v2_economico')
 
 API_FOOTBALL_KEY   = os.getenv('API_FOOTBALL_KEY')
+API_FOOTBALL_KEYS  = [k.strip() for k in os.getenv('API_FOOTBALL_KEYS', '').split(',') if k.strip()]
+API_KEY_AUTH_COOLDOWN = float(os.getenv('API_KEY_AUTH_COOLDOWN', '900'))
 TOKEN              = os.getenv('TOKEN')
 TELEGRAM_CHAT_ID   = os.getenv('TELEGRAM_CHAT_ID')
 TELEGRAM_ADMIN_ID  = os.getenv('TELEGRAM_ADMIN_ID')
 SCAN_INTERVAL_BASE = int(os.getenv('SCAN_INTERVAL', '45'))   # ⇦ default agora 45s
 RENOTIFY_MINUTES   = int(os.getenv('RENOTIFY_MINUTES', '3'))
-
+STATS_MAX_INFLIGHT = max(1, int(os.getenv('STATS_MAX_INFLIGHT', '8')))  # fan-out de stats
+STATS_BATCH        = os.getenv('STATS_BATCH', '1') not in ('0', 'false', 'False', '')
+ENRICH_CACHE_TTL   = int(os.getenv('ENRICH_CACHE_TTL', '14400'))  # standings mudam pouco no dia
+ENRICH_CACHE_MAX   = max(1, int(os.getenv('ENRICH_CACHE_MAX', '256')))
+SCAN_INTERVAL_MAX  = max(SCAN_INTERVAL_BASE, int(os.getenv('SCAN_INTERVAL_MAX', '900')))
+API_MINUTE_LIMIT   = max(1, int(os.getenv('API_MINUTE_LIMIT', '30')))
+QUOTA_RESERVE      = float(os.getenv('QUOTA_RESERVE', '0.05'))
+POLL_URGENT_MIN    = float(os.getenv('POLL_URGENT_MIN', '3'))      # últimos min. da janela: todo tick
+POLL_GAP_FACTOR    = float(os.getenv('POLL_GAP_FACTOR', '0.25'))   # espaçamento ∝ tempo até fechar
+POLL_MAX_GAP       = float(os.getenv('POLL_MAX_GAP', '120'))
+STATS_MAX_PER_TICK = int(os.getenv('STATS_MAX_PER_TICK', '0'))     # 0 = sem teto
+BATCH_SCORING_MIN  = int(os.getenv('BATCH_SCORING_MIN', '1000'))   # 0 = sempre escalar
+SETTLE_INTERVAL    = int(os.getenv('SETTLE_INTERVAL', '120'))      # 0 = sem liquidação automática
+SETTLE_MAX_AGE     = int(os.getenv('SETTLE_MAX_AGE', '21600'))     # pendente mais velho vira ANULADO
+TRACE_TICKS        = max(1, int(os.getenv('TRACE_TICKS', '50')))
+ADMIN_TOKEN        = os.getenv('ADMIN_TOKEN')
+PROFILE_DIR        = os.getenv('PROFILE_DIR', 'perfis')
+PROCESS_MODE       = os.getenv('PROCESS_MODE', 'single').strip().lower()  # single | split
+STATUS_SNAPSHOT_PATH = os.getenv('STATUS_SNAPSHOT_PATH', 'status_scanner.json')
+
+BOT_MODE           = os.getenv('BOT_MODE', 'live').strip().lower()     # live | record | replay
+RECORD_DIR         = os.getenv('RECORD_DIR', 'gravacoes')
+REPLAY_FILE        = os.getenv('REPLAY_FILE', '')
+REPLAY_SPEED       = max(1.0, float(os.getenv('REPLAY_SPEED', '1')))
+REPLAY_DIR         = os.getenv('REPLAY_DIR', 'replay_saida')
+
+if BOT_MODE not in ("live", "record", "replay"):
+    raise ValueError(f"⚠️ BOT_MODE inválido: {BOT_MODE} (use live, record ou replay).")
+if BOT_MODE == "replay":
+    # offline: nada sai para a rede, então as credenciais viram opcionais
+    if not REPLAY_FILE:
+        raise ValueError("⚠️ BOT_MODE=replay exige REPLAY_FILE.")
+    API_FOOTBALL_KEY = API_FOOTBALL_KEY or "replay"
+    API_FOOTBALL_KEYS = []
+    TOKEN = TOKEN or "replay"
+    TELEGRAM_CHAT_ID = TELEGRAM_CHAT_ID or "0"
+
+API_FOOTBALL_KEY = API_FOOTBALL_KEY or (API_FOOTBALL_KEYS[0] if API_FOOTBALL_KEYS else None)
 if not API_FOOTBALL_KEY:
     raise ValueError("⚠️ API_FOOTBALL_KEY não definida.")
 if not TOKEN or not TELEGRAM_CHAT_ID:
     raise ValueError("⚠️ Defina TOKEN e TELEGRAM_CHAT_ID.")
 
+class _TempoComprimido:
+    """Proxy do módulo time para o replay: time()/time_ns()/monotonic() andam `fator`x mais rápido e sleep() encolhe."""
+
+    def __init__(self, real, fator: float) -> None:
+        self._real = real
+        self._fator = fator
+        self._t0 = real.time()
+        self._m0 = real.monotonic()
+
+    def time(self) -> float:
+        return self._t0 + (self._real.time() - self._t0) * self._fator
+
+    def time_ns(self) -> int:
+        return int(self.time() * 1e9)
+
+    def monotonic(self) -> float:
+        return self._m0 + (self._real.monotonic() - self._m0) * self._fator
+
+    def sleep(self, seconds: float) -> None:
+        self._real.sleep(max(0.0, seconds) / self._fator)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._real, name)
+
+if BOT_MODE == "replay" and REPLAY_SPEED > 1:
+    # Todo o módulo (backoffs, agendador, baldes, threads) passa a ver o mesmo relógio acelerado.
+    time = _TempoComprimido(time, REPLAY_SPEED)
+
 # ===================== STATUS (antes das rotas) ==============
+PROCESS_ROLE = "single"   # single | scanner | web (ver "PROCESSOS")
+_parar = threading.Event()  # SIGTERM: o scanner termina o tick atual e sai
 START_TIME = int(time.time())
 LAST_SCAN_TIME: Optional[datetime] = None
 LAST_API_STATUS = "⏳ Aguardando..."
 LAST_RATE_USAGE = "0%"
 TOTAL_VARRIDURAS = 0
+LAST_SCAN_DURATION = 0.0  # segundos (wall-time) da última varredura
 total = 0  # jogos na última varredura
 
 # ===================== API CONFIG ============================
 API_BASE = "https://v3.football.api-sports.io"
 HEADERS = {"x-apisports-key": API_FOOTBALL_KEY}
+TELEGRAM_API_BASE = "https://api.telegram.org"
+FIXTURES_IDS_MAX = 20   # máx. de ids por chamada em /fixtures?ids=a-b-c (limite da API-Football)
+
+# Tamanho do pool keep-alive por host (o fan-out de stats precisa de ≥ STATS_MAX_INFLIGHT)
+HTTP_POOL_SIZES = {
+    urllib.parse.urlsplit(API_BASE).netloc: int(os.getenv('HTTP_POOL_API', str(STATS_MAX_INFLIGHT + 2))),
+    urllib.parse.urlsplit(TELEGRAM_API_BASE).netloc: int(os.getenv('HTTP_POOL_TELEGRAM', '4')),
+}
 
 # ===================== PARÂMETROS ============================
 HT_WINDOW = (29.8, 42.0)   # Janela HT
@@ -76,15 +228,30 @@ SMALL_STADIUMS = {
     'bet365 stadium','pride park','liberty stadium','fratton park',
 }
 
-# Anti-spam memória e controle de período (um por período)
-sent_signals: Dict[int, Dict[str, float]] = defaultdict(dict)
-sent_period: Dict[int, set] = defaultdict(set)        # {fixture_id: {"HT","FT"}}
-last_elapsed_seen: Dict[int, float] = {}              # suavização do minuto
-no_stats_backoff_until: Dict[int, float] = {}         # evitar pedir stats por Xs
+# Anti-spam, controle de período, minuto suavizado, backoff e próximo poll: um registro
+# compacto por jogo (ver "REGISTRO DE JOGOS"), despejado quando o jogo sai do live=all.
+FIXTURE_STATE_MAX   = max(50, int(os.getenv('FIXTURE_STATE_MAX', '2000')))    # teto duro de registros
+FIXTURE_STATE_GRACE = float(os.getenv('FIXTURE_STATE_GRACE', '300'))        # s fora do live=all antes de despejar
+FINISHED_STATUSES = {"FT", "AET", "PEN", "PST", "CANC", "ABD", "AWD", "WO"}
+
+def _ids_env(nome: str) -> frozenset:
+    return frozenset(int(x) for x in re.split(r"[,;\s-]+", os.getenv(nome, "")) if x.strip().isdigit())
+
+LEAGUE_ALLOW        = _ids_env('LEAGUE_ALLOW')    # vazio = todas
+LEAGUE_DENY         = _ids_env('LEAGUE_DENY')
+LEAGUE_SKIP_RESERVE = os.getenv('LEAGUE_SKIP_RESERVE', '1').strip() not in ('0', 'false', 'no')
+MOMENTUM_WINDOW     = max(1.0, float(os.getenv('MOMENTUM_WINDOW', '8')))       # minutos do ritmo recente
+STATE_SNAPSHOT_PATH     = os.getenv('STATE_SNAPSHOT_PATH', 'estado_scanner.json.gz')
+STATE_SNAPSHOT_INTERVAL = float(os.getenv('STATE_SNAPSHOT_INTERVAL', '60'))  # 0 = sem snapshot
+STATE_SNAPSHOT_MAX_AGE  = float(os.getenv('STATE_SNAPSHOT_MAX_AGE', '10800'))  # snapshot mais velho é ignorado
+MOMENTUM_SLOTS      = max(4, int(os.getenv('MOMENTUM_SLOTS', '16')))          # snapshots guardados por jogo
 
 # Diagnóstico
+BOOT_MONOTONIC = time.monotonic()
+PRIMEIRA_VARREDURA_UTIL: Optional[float] = None   # s do boot até a 1ª varredura que pontuou jogos na janela
 request_count = 0
 last_rate_headers: Dict[str, str] = {}
+_request_lock = threading.Lock()   # safe_request roda em várias threads (fan-out de stats)
 
 # ====================== ESCAPE HTML / MD =====================
 MDV2_SPECIALS = r'[_*\[\]()~`>#+\-=|{}.!]'
@@ -112,88 +279,603 @@ def root():
 def health():
     return jsonify({'status': 'ok'}), 200
 
+# ===================== MÉTRICAS (PROMETHEUS) =====================
+# Contadores/histogramas próprios (sem dependência extra): cada métrica tem um lock só seu e o
+# caminho quente faz apenas um incremento num dict. A exposição em texto é montada no GET /metrics.
+def _label_valor(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels_txt(nomes: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [n + '="' + _label_valor(v) + '"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+class MetricCounter:
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name, self.doc, self.labels = name, doc, labels
+        self._valores: Dict[Tuple[str, ...], float] = {} if labels else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._valores[label_values] = self._valores.get(label_values, 0.0) + amount
+
+    def collect(self, tipo: str = "counter") -> List[str]:
+        with self._lock:
+            itens = list(self._valores.items())
+        linhas = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {tipo}"]
+        linhas += [f"{self.name}{_labels_txt(self.labels, k)} {v:g}" for k, v in sorted(itens)]
+        return linhas
+
+class MetricGauge(MetricCounter):
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._valores[label_values] = float(value)
+
+    def collect(self, tipo: str = "gauge") -> List[str]:
+        return super().collect(tipo)
+
+class MetricHistogram:
+    def __init__(self, name: str, doc: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()) -> None:
+        self.name, self.doc, self.labels, self.buckets = name, doc, labels, tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}   # [contagem por bucket..., +Inf, soma]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(label_values)
+            if serie is None:
+                serie = self._series[label_values] = [0.0] * (len(self.buckets) + 2)
+            serie[i] += 1
+            serie[-1] += value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            itens = [(k, list(v)) for k, v in self._series.items()]
+        linhas = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        for k, serie in sorted(itens):
+            acumulado = 0.0
+            for le, n in zip(self.buckets + (float("inf"),), serie):
+                acumulado += n
+                le_txt = "+Inf" if le == float("inf") else f"{le:g}"
+                rotulos = _labels_txt(self.labels, k, 'le="' + le_txt + '"')
+                linhas.append(f"{self.name}_bucket{rotulos} {acumulado:g}")
+            linhas.append(f"{self.name}_sum{_labels_txt(self.labels, k)} {serie[-1]:g}")
+            linhas.append(f"{self.name}_count{_labels_txt(self.labels, k)} {acumulado:g}")
+        return linhas
+
+METRIC_API_LATENCY = MetricHistogram("escanteios_api_request_seconds", "Latência das chamadas à API-Football.",
+                                     (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10), ("endpoint",))
+METRIC_API_RESPONSES = MetricCounter("escanteios_api_responses_total", "Respostas da API-Football por status.",
+                                     ("endpoint", "status"))
+METRIC_SCAN_DURATION = MetricHistogram("escanteios_scan_duration_seconds", "Duração de cada varredura.",
+                                       (0.5, 1, 2, 5, 10, 20, 30, 60, 120))
+METRIC_SCAN_FIXTURES = MetricGauge("escanteios_scan_fixtures", "Jogos na última varredura por etapa.", ("etapa",))
+METRIC_STATS_BACKOFF = MetricCounter("escanteios_stats_backoff_hits_total",
+                                     "Pedidos de stats pulados por backoff do jogo.")
+METRIC_SIGNALS = MetricCounter("escanteios_signals_total", "Sinais enviados por estratégia e período.",
+                               ("estrategia", "periodo"))
+METRIC_TG_LATENCY = MetricHistogram("escanteios_telegram_delivery_seconds",
+                                    "Da fila até o 200 do Telegram.", (0.1, 0.5, 1, 2, 5, 10, 30, 60, 300))
+METRIC_TG_RESULTS = MetricCounter("escanteios_telegram_messages_total", "Mensagens por resultado.", ("resultado",))
+METRIC_FANOUT = MetricCounter("escanteios_signal_deliveries_total", "Sinais enfileirados por chat assinante.",
+                              ("template",))
+METRIC_STAGE_SECONDS = MetricHistogram("escanteios_scan_stage_seconds", "Tempo por etapa da varredura.",
+                                       (0.001, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30), ("etapa",))
+
+def render_metrics() -> str:
+    linhas: List[str] = []
+    for metrica in (METRIC_API_LATENCY, METRIC_API_RESPONSES, METRIC_SCAN_DURATION, METRIC_SCAN_FIXTURES,
+                    METRIC_STATS_BACKOFF, METRIC_SIGNALS, METRIC_FANOUT, METRIC_TG_LATENCY, METRIC_TG_RESULTS,
+                    METRIC_STAGE_SECONDS):
+        linhas += metrica.collect()
+    cota = [("minute", _header_int(last_rate_headers, 'x-ratelimit-minutely-remaining')),
+            ("day", _header_int(last_rate_headers, 'x-ratelimit-requests-remaining'))]
+    linhas += ["# HELP escanteios_api_quota_remaining Cota restante informada pelos headers x-ratelimit-*.",
+               "# TYPE escanteios_api_quota_remaining gauge"]
+    linhas += [f'escanteios_api_quota_remaining{{window="{w}"}} {v}' for w, v in cota if v is not None]
+    linhas += ["# HELP escanteios_api_key_requests_total Chamadas por chave do pool.",
+               "# TYPE escanteios_api_key_requests_total counter"]
+    linhas += [f'escanteios_api_key_requests_total{{key="{c.rotulo}"}} {c.usadas}' for c in _api_keys]
+    linhas += ["# HELP escanteios_api_key_quota_remaining Cota diária restante por chave.",
+               "# TYPE escanteios_api_key_quota_remaining gauge"]
+    linhas += [f'escanteios_api_key_quota_remaining{{key="{c.rotulo}"}} {v}' for c in _api_keys
+               for v in [_header_int(c.headers, 'x-ratelimit-requests-remaining')] if v is not None]
+    linhas += ["# HELP escanteios_api_key_in_rotation 1 se a chave está em rotação.",
+               "# TYPE escanteios_api_key_in_rotation gauge"]
+    linhas += [f'escanteios_api_key_in_rotation{{key="{c.rotulo}"}} {int(c.fora_ate <= time.time())}'
+               for c in _api_keys]
+    linhas += ["# HELP escanteios_api_requests_total Chamadas feitas à API-Football desde o boot.",
+               "# TYPE escanteios_api_requests_total counter",
+               f"escanteios_api_requests_total {request_count}",
+               "# HELP escanteios_quota_stage Estágio do agendador de cota (0 normal, 1 economia, 2 intervalo).",
+               "# TYPE escanteios_quota_stage gauge",
+               f"escanteios_quota_stage {QUOTA_STAGE}",
+               "# HELP escanteios_telegram_outbox_size Mensagens aguardando envio.",
+               "# TYPE escanteios_telegram_outbox_size gauge",
+               f"escanteios_telegram_outbox_size {_tg_outbox.qsize()}",
+               "# HELP escanteios_first_useful_scan_seconds Do boot até a 1ª varredura com jogos ao vivo.",
+               "# TYPE escanteios_first_useful_scan_seconds gauge",
+               f"escanteios_first_useful_scan_seconds {PRIMEIRA_VARREDURA_UTIL if PRIMEIRA_VARREDURA_UTIL is not None else 'NaN'}",
+               "# HELP escanteios_warm_start_fixtures Jogos restaurados do snapshot no boot.",
+               "# TYPE escanteios_warm_start_fixtures gauge",
+               f"escanteios_warm_start_fixtures {estado_restaurado}",
+               "# HELP escanteios_uptime_seconds Tempo desde o boot.",
+               "# TYPE escanteios_uptime_seconds gauge",
+               f"escanteios_uptime_seconds {int(time.time()) - START_TIME}"]
+    return "\n".join(linhas) + "\n"
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    texto = _status_snapshot().get("metrics_txt", "") if PROCESS_ROLE == "web" else render_metrics()
+    return Response(texto, content_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ====================== TELEGRAM WEBHOOK ======================
+# O webhook só valida, deduplica por update_id e enfileira: responde 200 na hora para o
+# Telegram não reenviar o update. Um worker executa os comandos fora da requisição.
+COMMAND_QUEUE_MAX = 100
+_cmd_queue: "queue.Queue[Tuple[str, str]]" = queue.Queue(maxsize=COMMAND_QUEUE_MAX)
+_cmd_worker_thread: Optional[threading.Thread] = None
+_cmd_worker_lock = threading.Lock()
+_seen_update_ids: "OrderedDict[int, None]" = OrderedDict()
+SEEN_UPDATES_MAX = 1000
+
+def _update_already_seen(update_id: Optional[int]) -> bool:
+    if update_id is None:
+        return False
+    with _cmd_worker_lock:
+        if update_id in _seen_update_ids:
+            return True
+        _seen_update_ids[update_id] = None
+        while len(_seen_update_ids) > SEEN_UPDATES_MAX:
+            _seen_update_ids.popitem(last=False)
+    return False
+
+def handle_command(text: str, chat_id: str) -> None:
+    # ====================== COMANDOS TELEGRAM ======================
+    if text == '/status':
+        send_telegram_message_plain(render_status_text(), parse_mode="HTML")
+
+    elif text == '/debug':
+        send_telegram_message_plain(render_debug_text(), parse_mode="HTML")
+
+    elif text == '/relatorio':
+        gerar_relatorio_diario()
+        logger.info("📊 Relatório diário solicitado via Telegram.")
+
+    elif text == '/trace':
+        if _is_admin(chat_id):
+            send_telegram_message_plain(render_trace_text(), parse_mode="HTML")
+
+    elif text.startswith('/profile'):
+        if _is_admin(chat_id):
+            partes = text.split()
+            n = int(partes[1]) if len(partes) > 1 and partes[1].isdigit() else 3
+            agendar_profile(n)
+            send_admin_message(f"🔬 cProfile ligado para as próximas {n} varreduras.")
+
+    elif text == '/start':
+        send_telegram_message_plain(
+            "🤖 Bot Escanteios RP VIP+ ativo!\n\n"
+            "📊 Use /relatorio para ver o desempenho do dia.\n"
+            "⚙️ Use /status para ver o estado do bot.",
+            parse_mode="HTML"
+        )
+
+def _is_admin(chat_id: str) -> bool:
+    return bool(TELEGRAM_ADMIN_ID) and str(chat_id) == str(TELEGRAM_ADMIN_ID)
+
+def _cmd_worker() -> None:
+    while True:
+        text, chat_id = _cmd_queue.get()
+        try:
+            handle_command(text, chat_id)
+        except Exception as e:
+            logger.exception("❌ Erro ao executar comando %s: %s", text, e)
+        finally:
+            _cmd_queue.task_done()
+
+def _ensure_cmd_worker() -> None:
+    global _cmd_worker_thread
+    if _cmd_worker_thread is not None:
+        return
+    with _cmd_worker_lock:
+        if _cmd_worker_thread is None:
+            _cmd_worker_thread = threading.Thread(target=_cmd_worker, name="cmd-worker", daemon=True)
+            _cmd_worker_thread.start()
+
 @app.route(f'/{TOKEN}', methods=['POST'])
 def telegram_webhook():
     try:
         data = request.get_json(force=True, silent=True) or {}
+        if _update_already_seen(data.get('update_id')):
+            logger.debug("Update %s repetido pelo Telegram. Ignorado.", data.get('update_id'))
+            return jsonify({"ok": True}), 200
         message = data.get('message') or data.get('edited_message') or {}
         text = (message.get('text') or '').strip().lower()
         chat_id = str(message.get('chat', {}).get('id', TELEGRAM_CHAT_ID))
 
-        # ====================== COMANDOS TELEGRAM ======================
-        if text == '/status':
-            uptime = int(time.time() - START_TIME)
-            horas = uptime // 3600
-            minutos = (uptime % 3600) // 60
-
-            total_jogos = globals().get("total", 0)
-            varreduras = globals().get("TOTAL_VARRIDURAS", 0)
-            api_status = globals().get("LAST_API_STATUS", "✅ OK")
-            uso_api = globals().get("LAST_RATE_USAGE", "Indefinido")
-            last_scan_dt: Optional[datetime] = globals().get("LAST_SCAN_TIME")
-            if last_scan_dt:
-                tz = pytz.timezone("America/Sao_Paulo")
-                last_scan_local = last_scan_dt.astimezone(tz) if last_scan_dt.tzinfo else tz.localize(last_scan_dt)
-                last_scan_txt = last_scan_local.strftime("%H:%M:%S")
-            else:
-                last_scan_txt = "Ainda não realizada"
-
-            resposta = (
-                "📊 Status Bot Escanteios RP VIP Plus\n"
-                "━━━━━━━━━━━━━━━━━━━\n"
-                f"🕒 Tempo online: {horas}h {minutos}min\n"
-                f"⚽ Jogos varridos: {total_jogos}\n"
-                f"🔁 Varreduras realizadas: {varreduras}\n"
-                f"⏱️ Última varredura: {last_scan_txt}\n"
-                f"🌐 Status API: {api_status}\n"
-                f"📉 Uso da API: {uso_api}\n"
-                "━━━━━━━━━━━━━━━━━━━\n"
-                "🤖 Versão: Multi v2 Econômico ULTRA Sensível v3.2.2 (NASA)"
-            )
-            send_telegram_message_plain(resposta, parse_mode="HTML")
-
-        elif text == '/debug':
-            resposta = (
-                "🧩 Modo Debug\n"
-                f"📦 Requests enviados: {request_count}\n"
-                f"⏱ Intervalo base: {SCAN_INTERVAL_BASE}s\n"
-                f"📡 Headers API: {last_rate_headers}"
-            )
-            send_telegram_message_plain(resposta, parse_mode="HTML")
-
-        elif text == '/relatorio':
-            gerar_relatorio_diario()
-            logger.info("📊 Relatório diário solicitado via Telegram.")
-
-        elif text == '/start':
-            send_telegram_message_plain(
-                "🤖 Bot Escanteios RP VIP+ ativo!\n\n"
-                "📊 Use /relatorio para ver o desempenho do dia.\n"
-                "⚙️ Use /status para ver o estado do bot.",
-                parse_mode="HTML"
-            )
+        if text.startswith('/'):
+            if PROCESS_ROLE == "web" and text.split()[0] in COMANDOS_DO_SCANNER:
+                _encaminhar_ao_scanner({"tipo": "comando", "text": text, "chat_id": chat_id})
+                return jsonify({"ok": True}), 200
+            _ensure_cmd_worker()
+            try:
+                _cmd_queue.put_nowait((text, chat_id))
+            except queue.Full:
+                logger.warning("⚠️ Fila de comandos cheia. Comando %s ignorado.", text)
 
     except Exception as e:
         logger.exception("❌ Erro no processamento do webhook: %s", e)
 
     return jsonify({"ok": True}), 200
 
+# ===================== HTTP (POOL KEEP-ALIVE) =====================
+# Uma Session por host: reaproveita TCP+TLS entre chamadas (API-Football e Telegram).
+_http_sessions: Dict[str, requests.Session] = {}
+_http_sessions_lock = threading.Lock()
+
+def _http_session(url: str) -> requests.Session:
+    host = urllib.parse.urlsplit(url).netloc
+    sess = _http_sessions.get(host)
+    if sess is not None:
+        return sess
+    with _http_sessions_lock:
+        sess = _http_sessions.get(host)
+        if sess is None:
+            pool_size = max(1, HTTP_POOL_SIZES.get(host, 2))
+            sess = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            sess.mount("https://", adapter)
+            sess.mount("http://", adapter)
+            sess.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+            if url.startswith(API_BASE):
+                sess.headers.update(HEADERS)
+            _http_sessions[host] = sess
+    return sess
+
+def http_get(url: str, params: Dict[str, Any] = None, headers: Dict[str, str] = None, timeout: float = 10) -> requests.Response:
+    return _http_session(url).get(url, params=params, headers=headers, timeout=timeout)
+
+def http_post(url: str, json_body: Dict[str, Any] = None, timeout: float = 20) -> requests.Response:
+    return _http_session(url).post(url, json=json_body, timeout=timeout)
+
+# ===================== GRAVAÇÃO / REPLAY DA API =====================
+# Toda chamada à API-Football passa por api_get. Em BOT_MODE=record a resposta é gravada
+# (instante relativo, url, params, status, x-ratelimit-*, corpo) num JSONL gzip; em
+# BOT_MODE=replay o ReplayAPI responde com a gravação mais recente até o instante atual.
+GRAVACAO_FLUSH_A_CADA = 20
+RATE_HEADER_KEYS = ('x-ratelimit-requests-remaining', 'x-ratelimit-requests-limit',
+                    'x-ratelimit-minutely-remaining', 'x-ratelimit-minutely-limit')
+
+class _RespostaGravada:
+    """Resposta mínima (status_code, headers, json(), text) servida no replay e no Telegram desligado."""
+
+    def __init__(self, status_code: int, headers: Dict[str, Any], body: Any) -> None:
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self._body = body
+
+    def json(self) -> Any:
+        if self._body is None:
+            raise ValueError("resposta gravada sem JSON")
+        return self._body
+
+    @property
+    def text(self) -> str:
+        return json.dumps(self._body, ensure_ascii=False)[:500]
+
+class ReplayAPI:
+    """Serve uma gravação: por endpoint+params, a resposta gravada mais recente até o instante do replay."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.respostas: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Tuple[List[float], List[Dict[str, Any]]]] = {}
+        self.duracao = 0.0
+        self.servidas = 0
+        self.sem_gravacao = 0
+        total_linhas = 0
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        reg = json.loads(linha)
+                    except ValueError:
+                        continue  # última linha cortada (gravação interrompida)
+                    ts, regs = self.respostas.setdefault(_scan_key(reg["url"], reg.get("params")), ([], []))
+                    ts.append(reg["t"])
+                    regs.append(reg)
+                    self.duracao = max(self.duracao, reg["t"])
+                    total_linhas += 1
+        except (EOFError, OSError) as e:
+            logger.warning("Gravação %s truncada (%s); usando %d respostas lidas.", path, e, total_linhas)
+        self.inicio = time.monotonic()
+        logger.info("▶️ Replay de %s: %d respostas, %d endpoints, %.0fs gravados (velocidade %.0fx).",
+                    path, total_linhas, len(self.respostas), self.duracao, REPLAY_SPEED)
+
+    def instante(self) -> float:
+        return time.monotonic() - self.inicio
+
+    @property
+    def terminou(self) -> bool:
+        return self.instante() > self.duracao
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None) -> _RespostaGravada:
+        gravadas = self.respostas.get(_scan_key(url, params))
+        if not gravadas:
+            self.sem_gravacao += 1
+            return _RespostaGravada(404, {}, {"errors": {"replay": "sem gravação"}, "response": []})
+        ts, regs = gravadas
+        reg = regs[max(0, bisect.bisect_right(ts, self.instante()) - 1)]
+        self.servidas += 1
+        return _RespostaGravada(reg["status"], reg.get("headers"), reg.get("body"))
+
+_replay: Optional[ReplayAPI] = None
+_gravador = None
+_gravador_t0 = 0.0
+_gravador_linhas = 0
+_gravacao_lock = threading.Lock()
+
+def _replay_api() -> ReplayAPI:
+    global _replay
+    if _replay is None:
+        with _gravacao_lock:
+            if _replay is None:
+                _replay = ReplayAPI(REPLAY_FILE)
+    return _replay
+
+def _gravar_resposta(url: str, params: Optional[Dict[str, Any]], response: requests.Response) -> None:
+    global _gravador, _gravador_t0, _gravador_linhas
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    reg = {"url": url, "params": {k: str(v) for k, v in (params or {}).items()}, "status": response.status_code,
+           "headers": {k: response.headers.get(k) for k in RATE_HEADER_KEYS if response.headers.get(k) is not None},
+           "body": body}
+    with _gravacao_lock:
+        if _gravador is None:
+            os.makedirs(RECORD_DIR, exist_ok=True)
+            path = os.path.join(RECORD_DIR, f"api-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+            _gravador = gzip.open(path, "at", encoding="utf-8")
+            _gravador_t0 = time.monotonic()
+            atexit.register(_fechar_gravador)
+            logger.info("⏺ Gravando respostas da API-Football em %s.", path)
+        reg["t"] = round(time.monotonic() - _gravador_t0, 3)
+        _gravador.write(json.dumps(reg, ensure_ascii=False) + "\n")
+        _gravador_linhas += 1
+        if _gravador_linhas % GRAVACAO_FLUSH_A_CADA == 0:
+            _gravador.flush()
+
+def _fechar_gravador() -> None:
+    global _gravador
+    with _gravacao_lock:
+        if _gravador is not None:
+            _gravador.close()
+            _gravador = None
+
+def api_get(url: str, params: Dict[str, Any] = None, headers: Dict[str, str] = None, timeout: float = 10):
+    """GET na API-Football: chave do pool, balde de rate limit, contabilização e, conforme BOT_MODE, gravação ou replay."""
+    chave = escolher_chave()
+    chave.balde.acquire()
+    endpoint = urllib.parse.urlsplit(url).path
+    t0 = time.perf_counter()
+    try:
+        if BOT_MODE == "replay":
+            response = _replay_api().get(url, params)
+        else:
+            headers = dict(headers or {}, **{"x-apisports-key": chave.chave})
+            response = http_get(url, params=params, headers=headers, timeout=timeout)
+    except Exception:
+        METRIC_API_RESPONSES.inc(endpoint, "erro")
+        raise
+    finally:
+        METRIC_API_LATENCY.observe(time.perf_counter() - t0, endpoint)
+    METRIC_API_RESPONSES.inc(endpoint, str(response.status_code))
+    if BOT_MODE == "record":
+        _gravar_resposta(url, params, response)
+    _note_api_response(url, response, chave)
+    return response
+
+def http_pool_stats() -> Dict[str, Dict[str, int]]:
+    """Por host: requisições feitas, conexões abertas e quantas reaproveitaram uma conexão viva."""
+    out: Dict[str, Dict[str, int]] = {}
+    for host, sess in list(_http_sessions.items()):
+        reqs = conns = 0
+        for adapter in set(sess.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                reqs += getattr(pool, "num_requests", 0)
+                conns += getattr(pool, "num_connections", 0)
+        out[host] = {"requests": reqs, "connections": conns, "reused": max(0, reqs - conns)}
+    return out
+
+def http_pool_summary() -> str:
+    partes = []
+    for host, st in http_pool_stats().items():
+        ratio = (st["reused"] / st["requests"] * 100) if st["requests"] else 0.0
+        partes.append(f"{host.split('.')[-2]} {ratio:.0f}% ({st['reused']}/{st['requests']})")
+    return " | ".join(partes) or "sem conexões ainda"
+
+# ===================== RATE LIMIT (TOKEN BUCKET) =====================
+class TokenBucket:
+    """Balde de tokens thread-safe: repõe `rate` tokens/s até `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def configure(self, rate: float, capacity: float) -> None:
+        with self._lock:
+            self._refill()
+            self.rate, self.capacity = float(rate), float(capacity)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def disponivel(self) -> float:
+        """Tokens disponíveis agora (já repostos)."""
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+    def fracao_livre(self) -> float:
+        """Fração do balde disponível agora (0..1)."""
+        with self._lock:
+            self._refill()
+            return self.tokens / max(1.0, self.capacity)
+
+    def drain_to(self, tokens: float) -> None:
+        """Sincroniza com o servidor: nunca acreditar em mais tokens do que ele diz restar."""
+        with self._lock:
+            self._refill()
+            self.tokens = max(0.0, min(self.tokens, float(tokens)))
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return True
+                wait = (1.0 - self.tokens) / self.rate if self.rate > 0 else 1.0
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(min(wait, 1.0))
+
 # ====================== TELEGRAM HELPERS ======================
-def _tg_send(chat_id: str, text: str, parse_mode: Optional[str] = None, disable_web_page_preview: bool = True) -> None:
-    url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
+# Envio assíncrono: o scanner só enfileira; workers entregam respeitando os limites do
+# Telegram (~30 msg/s global, ~1 msg/s por chat privado, ~20 msg/min por grupo).
+TELEGRAM_OUTBOX_WORKERS = max(1, int(os.getenv('TELEGRAM_OUTBOX_WORKERS', '2')))
+TELEGRAM_OUTBOX_MAX     = max(10, int(os.getenv('TELEGRAM_OUTBOX_MAX', '500')))
+TELEGRAM_MAX_RETRIES    = max(0, int(os.getenv('TELEGRAM_MAX_RETRIES', '5')))
+TELEGRAM_GLOBAL_RATE    = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))      # msg/s (limite oficial 30)
+
+_tg_outbox: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=TELEGRAM_OUTBOX_MAX)
+_tg_workers: List[threading.Thread] = []
+_tg_workers_lock = threading.Lock()
+_tg_global_bucket = TokenBucket(rate=TELEGRAM_GLOBAL_RATE, capacity=TELEGRAM_GLOBAL_RATE)
+_tg_chat_buckets: Dict[str, TokenBucket] = {}
+_tg_stats_lock = threading.Lock()
+tg_stats = {"enviadas": 0, "falhas": 0, "descartadas": 0, "retries": 0,
+            "latencia_ultima": 0.0, "latencia_media": 0.0, "latencia_max": 0.0}
+
+def _tg_chat_bucket(chat_id: str) -> TokenBucket:
+    bucket = _tg_chat_buckets.get(chat_id)
+    if bucket is None:
+        with _tg_workers_lock:
+            bucket = _tg_chat_buckets.get(chat_id)
+            if bucket is None:
+                grupo = str(chat_id).startswith("-")
+                bucket = TokenBucket(rate=20 / 60.0, capacity=3) if grupo else TokenBucket(rate=1.0, capacity=1)
+                _tg_chat_buckets[chat_id] = bucket
+    return bucket
+
+def _tg_post(chat_id: str, text: str, parse_mode: Optional[str], disable_web_page_preview: bool) -> requests.Response:
+    url = f"{TELEGRAM_API_BASE}/bot{TOKEN}/sendMessage"
     payload = {"chat_id": chat_id, "text": str(text), "disable_web_page_preview": disable_web_page_preview}
     if parse_mode:
         payload["parse_mode"] = parse_mode
+    if BOT_MODE == "replay":  # offline: nada vai ao Telegram
+        logger.debug("📵 [replay] Telegram %s: %s", chat_id, str(text)[:120])
+        return _RespostaGravada(200, {}, {"ok": True, "result": {}})
+    return http_post(url, payload, timeout=20)
+
+def _tg_retry_after(r: requests.Response) -> Optional[float]:
     try:
-        r = requests.post(url, json=payload, timeout=20)
-        if r.status_code != 200:
+        return float((r.json().get("parameters") or {}).get("retry_after"))
+    except Exception:
+        return None
+
+def _tg_deliver(item: Dict[str, Any]) -> None:
+    """Entrega um item da fila: 429 respeita retry_after, erro de parse cai para texto puro, 5xx/rede com backoff."""
+    chat_id = item["chat_id"]
+    parse_mode = item["parse_mode"]
+    for tentativa in range(TELEGRAM_MAX_RETRIES + 1):
+        _tg_chat_bucket(chat_id).acquire()
+        _tg_global_bucket.acquire()
+        try:
+            r = _tg_post(chat_id, item["text"], parse_mode, item["preview"])
+        except Exception as e:
+            logger.warning("Erro de rede ao enviar para o Telegram (tentativa %d): %s", tentativa + 1, e)
+            r = None
+        if r is not None and r.status_code == 200:
+            latencia = time.time() - item["enfileirado_em"]
+            METRIC_TG_LATENCY.observe(latencia)
+            METRIC_TG_RESULTS.inc("enviada")
+            with _tg_stats_lock:
+                tg_stats["enviadas"] += 1
+                tg_stats["latencia_ultima"] = latencia
+                tg_stats["latencia_max"] = max(tg_stats["latencia_max"], latencia)
+                tg_stats["latencia_media"] = latencia if tg_stats["enviadas"] == 1 else \
+                    0.9 * tg_stats["latencia_media"] + 0.1 * latencia
+            return
+        with _tg_stats_lock:
+            tg_stats["retries"] += 1
+        if r is not None and r.status_code == 429:
+            espera = _tg_retry_after(r) or 2 ** tentativa
+            logger.warning("Telegram 429 (chat=%s). Aguardando %.0fs.", chat_id, espera)
+            _tg_chat_bucket(chat_id).drain_to(0)
+            time.sleep(min(espera, 60.0))
+        elif r is not None and 400 <= r.status_code < 500:
             logger.warning(f"Telegram resposta {r.status_code}: {r.text}")
-            # fallback sem parse_mode
-            fallback_payload = {"chat_id": chat_id, "text": str(text), "disable_web_page_preview": True}
-            requests.post(url, json=fallback_payload, timeout=20)
-    except Exception as e:
-        logger.exception("Erro ao enviar mensagem para o Telegram: %s", e)
+            if not parse_mode:
+                break  # erro do próprio pedido: repetir não adianta
+            parse_mode = None  # fallback sem parse_mode
+        else:
+            time.sleep(min(2 ** tentativa, 30))
+    with _tg_stats_lock:
+        tg_stats["falhas"] += 1
+    METRIC_TG_RESULTS.inc("falha")
+    logger.error("❌ Mensagem para o Telegram descartada após %d tentativas (chat=%s).", tentativa + 1, chat_id)
+
+def _tg_worker() -> None:
+    while True:
+        item = _tg_outbox.get()
+        try:
+            _tg_deliver(item)
+        except Exception as e:
+            logger.exception("Erro no worker do Telegram: %s", e)
+        finally:
+            _tg_outbox.task_done()
+
+def _ensure_tg_workers() -> None:
+    if len(_tg_workers) >= TELEGRAM_OUTBOX_WORKERS:
+        return
+    with _tg_workers_lock:
+        while len(_tg_workers) < TELEGRAM_OUTBOX_WORKERS:
+            t = threading.Thread(target=_tg_worker, name=f"tg-outbox-{len(_tg_workers)}", daemon=True)
+            t.start()
+            _tg_workers.append(t)
+
+def _tg_send(chat_id: str, text: str, parse_mode: Optional[str] = None, disable_web_page_preview: bool = True) -> None:
+    """Enfileira a mensagem e retorna na hora (o scanner nunca espera a entrega)."""
+    _ensure_tg_workers()
+    item = {"chat_id": str(chat_id), "text": str(text), "parse_mode": parse_mode,
+            "preview": disable_web_page_preview, "enfileirado_em": time.time()}
+    try:
+        _tg_outbox.put_nowait(item)
+    except queue.Full:
+        with _tg_stats_lock:
+            tg_stats["descartadas"] += 1
+        logger.error("❌ Fila do Telegram cheia (%d). Mensagem descartada.", TELEGRAM_OUTBOX_MAX)
+
+def tg_outbox_summary() -> str:
+    return (f"fila {_tg_outbox.qsize()}/{TELEGRAM_OUTBOX_MAX} | enviadas {tg_stats['enviadas']} | "
+            f"falhas {tg_stats['falhas']} | descartadas {tg_stats['descartadas']} | retries {tg_stats['retries']} | "
+            f"latência média {tg_stats['latencia_media']:.1f}s (máx. {tg_stats['latencia_max']:.1f}s)")
 
 def send_telegram_message(text: str, parse_mode: str = "MarkdownV2") -> None:
     _tg_send(TELEGRAM_CHAT_ID, text, parse_mode=parse_mode, disable_web_page_preview=True)
@@ -205,20 +887,255 @@ def send_admin_message(text: str) -> None:
     if TELEGRAM_ADMIN_ID:
         _tg_send(TELEGRAM_ADMIN_ID, text, parse_mode="HTML", disable_web_page_preview=True)
 
+# ===================== POOL DE CHAVES DA API =====================
+# Cada chave tem seu balde por minuto (ajustado pelos x-ratelimit-minutely-* dela) e a cota
+# diária que o servidor informou. api_get escolhe a chave com mais folga; o agendador de
+# cota enxerga a soma do pool em last_rate_headers.
+class ChaveAPI:
+    __slots__ = ("chave", "rotulo", "balde", "headers", "usadas", "erros", "fora_ate", "motivo")
+
+    def __init__(self, chave: str) -> None:
+        self.chave = chave
+        self.rotulo = "…" + chave[-4:]                 # nunca logar a chave inteira
+        self.balde = TokenBucket(rate=API_MINUTE_LIMIT / 60.0, capacity=API_MINUTE_LIMIT)
+        self.headers: Dict[str, Optional[str]] = {}    # últimos x-ratelimit-* desta chave
+        self.usadas = 0
+        self.erros = 0
+        self.fora_ate = 0.0                            # fora de rotação até (time.time())
+        self.motivo = ""
+
+    def folga(self) -> float:
+        """Fração livre (0..1): o menor entre o balde do minuto e a cota diária conhecida."""
+        minuto = self.balde.fracao_livre()
+        rem_dia = _header_int(self.headers, 'x-ratelimit-requests-remaining')
+        lim_dia = _header_int(self.headers, 'x-ratelimit-requests-limit')
+        dia = 1.0 if rem_dia is None else rem_dia / max(1, lim_dia or rem_dia)
+        return min(minuto, dia)
+
+_api_keys: List[ChaveAPI] = [ChaveAPI(k) for k in dict.fromkeys([API_FOOTBALL_KEY] + API_FOOTBALL_KEYS)]
+_api_keys_lock = threading.Lock()
+
+def escolher_chave() -> ChaveAPI:
+    """Chave em rotação com mais folga; se todas estiverem fora, a que volta primeiro."""
+    if len(_api_keys) == 1:
+        return _api_keys[0]
+    now = time.time()
+    with _api_keys_lock:
+        ativas = [c for c in _api_keys if c.fora_ate <= now]
+        if not ativas:
+            return min(_api_keys, key=lambda c: c.fora_ate)
+        return max(ativas, key=lambda c: c.folga())
+
+def _tirar_de_rotacao(chave: ChaveAPI, ate: float, motivo: str) -> None:
+    with _api_keys_lock:
+        chave.erros += 1
+        chave.fora_ate, chave.motivo = max(chave.fora_ate, ate), motivo
+    logger.warning("🔑 Chave %s fora de rotação por %.0fs (%s).", chave.rotulo, ate - time.time(), motivo)
+
+def _headers_do_pool() -> Dict[str, str]:
+    """Soma dos x-ratelimit-* das chaves que já responderam (menos as bloqueadas por autenticação)."""
+    soma: Dict[str, int] = {}
+    for chave in _api_keys:
+        if chave.motivo.startswith("HTTP 40") and chave.fora_ate > time.time():
+            continue
+        for k in RATE_HEADER_KEYS:
+            v = _header_int(chave.headers, k)
+            if v is not None:
+                soma[k] = soma.get(k, 0) + v
+    return {k: str(v) for k, v in soma.items()}
+
+def _pool_balde() -> Tuple[float, float]:
+    """(tokens, capacidade) somados dos baldes por minuto das chaves em rotação."""
+    now = time.time()
+    ativas = [c for c in _api_keys if c.fora_ate <= now] or _api_keys
+    return sum(c.balde.disponivel() for c in ativas), sum(c.balde.capacity for c in ativas)
+
+def api_keys_summary() -> str:
+    now = time.time()
+    partes = []
+    for c in _api_keys:
+        dia = f"{c.headers.get('x-ratelimit-requests-remaining') or '?'}/{c.headers.get('x-ratelimit-requests-limit') or '?'}"
+        mins = f"{c.headers.get('x-ratelimit-minutely-remaining') or '?'}/{c.headers.get('x-ratelimit-minutely-limit') or '?'}"
+        estado = f"⏸ {c.motivo} ({c.fora_ate - now:.0f}s)" if c.fora_ate > now else "✅"
+        partes.append(f"{c.rotulo} {estado} dia {dia} min {mins} | {c.usadas} req, {c.erros} erros")
+    return " ; ".join(partes)
+
+# ===================== COTA: AGENDADOR ADAPTATIVO =====================
+
+# Endpoints de enriquecimento (dispensáveis quando a cota aperta)
+ENRICH_ENDPOINTS = {"/odds", "/standings", "/fixtures/events"}
+
+QUOTA_STAGE = 0   # 0 normal | 1 economia (sem enriquecimento) | 2 intervalo estendido
+QUOTA_STAGE_NAMES = {0: "✅ normal", 1: "🟡 economia (sem enriquecimento)", 2: "🔴 intervalo estendido"}
+_tick_calls: Counter = Counter()                 # chamadas reais por categoria no tick atual
+calls_fora_da_varredura: Counter = Counter()     # desde o boot, por thread paralela (ex.: liquidação)
+_calls_per_tick_ema: Dict[str, float] = {}       # média móvel por categoria ('core', 'enrich')
+
+def _header_int(headers: Dict[str, Any], key: str) -> Optional[int]:
+    try:
+        v = headers.get(key)
+        return int(v) if v not in (None, "", "None") else None
+    except (TypeError, ValueError):
+        return None
+
+def _note_api_response(url: str, response: requests.Response, chave: Optional[ChaveAPI] = None) -> None:
+    """Contabiliza a chamada e sincroniza o balde da chave com os x-ratelimit-* da resposta."""
+    global request_count, last_rate_headers
+    chave = chave or _api_keys[0]
+    with _request_lock:
+        request_count += 1
+        chave.usadas += 1
+        fora = _rotulo_fora_da_varredura()
+        if fora:
+            calls_fora_da_varredura[fora] += 1   # não entra na média por tick do agendador
+        else:
+            _tick_calls["enrich" if urllib.parse.urlsplit(url).path in ENRICH_ENDPOINTS else "core"] += 1
+    headers = {k: response.headers.get(k) for k in RATE_HEADER_KEYS}
+    if any(v is not None for v in headers.values()):
+        chave.headers = headers
+    last_rate_headers = _headers_do_pool() if len(_api_keys) > 1 else headers
+    balde = chave.balde
+    lim_min = _header_int(headers, 'x-ratelimit-minutely-limit')
+    rem_min = _header_int(headers, 'x-ratelimit-minutely-remaining')
+    rem_dia = _header_int(headers, 'x-ratelimit-requests-remaining')
+    if lim_min and lim_min != balde.capacity:
+        balde.configure(lim_min / 60.0, lim_min)
+    if rem_min is not None:
+        balde.drain_to(rem_min)
+    if response.status_code == 429:
+        balde.drain_to(0)
+        logger.warning("⚠️ API-Football 429 (limite por minuto, chave %s). Balde zerado.", chave.rotulo)
+        if len(_api_keys) > 1 and rem_dia != 0:
+            _tirar_de_rotacao(chave, time.time() + 60, "429")
+    elif response.status_code in (401, 403) and len(_api_keys) > 1:
+        _tirar_de_rotacao(chave, time.time() + API_KEY_AUTH_COOLDOWN, f"HTTP {response.status_code}")
+    if rem_dia == 0 and len(_api_keys) > 1:
+        virada = (datetime.fromtimestamp(time.time(), timezone.utc) + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        _tirar_de_rotacao(chave, virada.timestamp(), "cota diária")
+
+def quota_skip_enrichment() -> bool:
+    return QUOTA_STAGE >= 1
+
+def plan_scan_interval() -> int:
+    """
+    Fecha o tick: atualiza a média de chamadas por tick e reparte a cota diária
+    restante até a virada (00:00 UTC). Degrada em estágios: primeiro corta o
+    enriquecimento, depois alonga o intervalo.
+    """
+    global QUOTA_STAGE
+    with _request_lock:
+        tick = dict(_tick_calls)
+        _tick_calls.clear()
+    for cat in ("core", "enrich"):
+        n = float(tick.get(cat, 0))
+        if cat == "enrich" and QUOTA_STAGE >= 1 and cat in _calls_per_tick_ema:
+            continue  # enriquecimento cortado: manter a última média conhecida
+        prev = _calls_per_tick_ema.get(cat)
+        _calls_per_tick_ema[cat] = n if prev is None else 0.7 * prev + 0.3 * n
+
+    rem_day = _header_int(last_rate_headers, 'x-ratelimit-requests-remaining')
+    lim_day = _header_int(last_rate_headers, 'x-ratelimit-requests-limit')
+    lim_min = _header_int(last_rate_headers, 'x-ratelimit-minutely-limit') or int(_pool_balde()[1])
+    if rem_day is None:
+        QUOTA_STAGE = 0
+        return SCAN_INTERVAL_BASE
+
+    core = max(1.0, _calls_per_tick_ema.get("core", 1.0))
+    enrich = _calls_per_tick_ema.get("enrich", 0.0)
+    now_utc = datetime.fromtimestamp(time.time(), timezone.utc)   # relógio acelerado no replay
+    reset = (now_utc + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    secs_left = max(60.0, (reset - now_utc).total_seconds())
+    budget = max(0.0, rem_day - QUOTA_RESERVE * (lim_day or rem_day))
+    ticks_at_base = secs_left / SCAN_INTERVAL_BASE
+
+    if budget >= (core + enrich) * ticks_at_base:
+        QUOTA_STAGE, per_tick, interval = 0, core + enrich, float(SCAN_INTERVAL_BASE)
+    elif budget >= core * ticks_at_base:
+        QUOTA_STAGE, per_tick, interval = 1, core, float(SCAN_INTERVAL_BASE)
+    else:
+        QUOTA_STAGE, per_tick = 2, core
+        interval = core * secs_left / max(1.0, budget)
+
+    # Teto por minuto: um tick não pode gastar mais do que o minuto permite
+    interval = max(interval, per_tick * 60.0 / max(1, lim_min))
+    return int(min(SCAN_INTERVAL_MAX, max(SCAN_INTERVAL_BASE, math.ceil(interval))))
+
+def quota_summary() -> str:
+    core = _calls_per_tick_ema.get("core", 0.0)
+    enrich = _calls_per_tick_ema.get("enrich", 0.0)
+    tokens, capacidade = _pool_balde()
+    fora = ", ".join(f"{n} {rotulo}" for rotulo, n in sorted(calls_fora_da_varredura.items())) or "0"
+    return (f"{QUOTA_STAGE_NAMES.get(QUOTA_STAGE, QUOTA_STAGE)} | chamadas/tick ≈ {core:.0f} núcleo + "
+            f"{enrich:.0f} enriquecimento | fora do tick: {fora} | balde {tokens:.0f}/{capacidade:.0f}")
+
+# ===================== CONTEXTO DA VARREDURA (DEDUPE) =====================
+# Durante um tick, cada endpoint+params é buscado no máximo uma vez: safe_request e
+# _read_json_fast consultam este memo antes de ir à rede. Fora de um tick não há memo.
+# Threads que rodam em paralelo à varredura (liquidação) se marcam com fora_da_varredura()
+# e não leem nem escrevem no memo do tick.
+_thread_ctx = threading.local()
+
+def fora_da_varredura(rotulo: str) -> None:
+    """Marca a thread atual como alheia à varredura (rotulo vai para a contagem de chamadas)."""
+    _thread_ctx.fora = rotulo
+
+def _rotulo_fora_da_varredura() -> Optional[str]:
+    return getattr(_thread_ctx, "fora", None)
+
+_scan_memo: Optional[Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Any]] = None
+_scan_memo_lock = threading.Lock()
+scan_calls_saved = 0          # chamadas poupadas na varredura atual/última
+scan_calls_saved_total = 0
+
+def begin_scan_context() -> None:
+    global _scan_memo, scan_calls_saved
+    with _scan_memo_lock:
+        _scan_memo = {}
+        scan_calls_saved = 0
+
+def end_scan_context() -> None:
+    global _scan_memo
+    with _scan_memo_lock:
+        _scan_memo = None
+
+def _scan_key(url: str, params: Optional[Dict[str, Any]]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    parts = urllib.parse.urlsplit(url)
+    query = dict(urllib.parse.parse_qsl(parts.query))
+    query.update({k: str(v) for k, v in (params or {}).items()})
+    return f"{parts.netloc}{parts.path}", tuple(sorted(query.items()))
+
+def _scan_memo_get(url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+    global scan_calls_saved, scan_calls_saved_total
+    if _scan_memo is None or _rotulo_fora_da_varredura():
+        return None
+    with _scan_memo_lock:
+        if _scan_memo is None:
+            return None
+        data = _scan_memo.get(_scan_key(url, params))
+        if data is not None:
+            scan_calls_saved += 1
+            scan_calls_saved_total += 1
+        return data
+
+def _scan_memo_put(url: str, params: Optional[Dict[str, Any]], data: Any) -> None:
+    if _scan_memo is None or _rotulo_fora_da_varredura():
+        return
+    with _scan_memo_lock:
+        if _scan_memo is not None:
+            _scan_memo[_scan_key(url, params)] = data
+
 # ===================== API CALLS =====================
 def safe_request(url: str, headers: Dict[str, str], params: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
-    global request_count, last_rate_headers
+    cached = _scan_memo_get(url, params)
+    if cached is not None:
+        return cached
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        request_count += 1
-        last_rate_headers = {
-            'x-ratelimit-requests-remaining': response.headers.get('x-ratelimit-requests-remaining'),
-            'x-ratelimit-requests-limit': response.headers.get('x-ratelimit-requests-limit'),
-            'x-ratelimit-minutely-remaining': response.headers.get('x-ratelimit-minutely-remaining'),
-            'x-ratelimit-minutely-limit': response.headers.get('x-ratelimit-minutely-limit'),
-        }
+        response = api_get(url, params=params, headers=headers, timeout=10)
         if response.status_code == 200:
-            return response.json()
+            data = response.json()
+            _scan_memo_put(url, params, data)
+            return data
         logger.warning("⚠️ Erro API-Football %s: %s", response.status_code, response.text)
         return None
     except requests.exceptions.Timeout:
@@ -228,16 +1145,77 @@ def safe_request(url: str, headers: Dict[str, str], params: Dict[str, Any] = Non
         logger.exception("Erro em safe_request: %s", e)
         return None
 
+# ===================== FILTRO E PROJEÇÃO DO LIVE=ALL =====================
+# O live=all traz centenas de fixtures aninhados (score, periods, venue, logos, flags...) e o
+# pipeline lê meia dúzia de campos. Cada fixture vira um dict enxuto logo na chegada, e ligas
+# fora da allow-list, na deny-list ou de reservas/sub-XX saem antes da seleção (e das stats).
+live_filter_stats: Dict[str, int] = {"recebidos": 0, "liga": 0, "reservas": 0}
+_liga_descartada: Dict[int, bool] = {}   # league_id -> descartar? (o nome da liga não muda)
+
+def _descartar_liga(league: Dict[str, Any]) -> Optional[str]:
+    """Motivo do descarte ('liga' | 'reservas') ou None se a liga segue na varredura."""
+    league_id = league.get("id")
+    if (LEAGUE_ALLOW and league_id not in LEAGUE_ALLOW) or league_id in LEAGUE_DENY:
+        return "liga"
+    if not LEAGUE_SKIP_RESERVE:
+        return None
+    reserva = _liga_descartada.get(league_id)
+    if reserva is None:
+        reserva = _is_probably_reserve_or_uX(league.get("name", ""))
+        if league_id is not None:
+            _liga_descartada[league_id] = reserva
+    return "reservas" if reserva else None
+
+def projetar_fixture(fx: Dict[str, Any]) -> Dict[str, Any]:
+    """Só os campos que seleção, stats, enriquecimento, mensagem e relatório leem."""
+    info = fx.get("fixture") or {}
+    status = info.get("status") or {}
+    league = fx.get("league") or {}
+    teams = fx.get("teams") or {}
+    home, away = teams.get("home") or {}, teams.get("away") or {}
+    goals = fx.get("goals") or {}
+    return {
+        "fixture": {"id": info.get("id"),
+                    "status": {"short": status.get("short"), "elapsed": status.get("elapsed")},
+                    "venue": {"name": (info.get("venue") or {}).get("name") or ""}},
+        "league": {"id": league.get("id"), "name": league.get("name") or "", "season": league.get("season")},
+        "teams": {"home": {"id": home.get("id"), "name": home.get("name") or ""},
+                  "away": {"id": away.get("id"), "name": away.get("name") or ""}},
+        "goals": {"home": goals.get("home"), "away": goals.get("away")},
+    }
+
+def filtrar_e_projetar(fixtures: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    descartes = {"liga": 0, "reservas": 0}
+    out = []
+    for fx in fixtures:
+        motivo = _descartar_liga(fx.get("league") or {})
+        if motivo:
+            descartes[motivo] += 1
+            continue
+        out.append(projetar_fixture(fx))
+    live_filter_stats.update(recebidos=len(fixtures), **descartes)
+    return out
+
+def live_filter_summary() -> str:
+    filtro = []
+    if LEAGUE_ALLOW:
+        filtro.append(f"allow={len(LEAGUE_ALLOW)} ligas")
+    if LEAGUE_DENY:
+        filtro.append(f"deny={len(LEAGUE_DENY)} ligas")
+    filtro.append("reservas fora" if LEAGUE_SKIP_RESERVE else "reservas com aviso")
+    return (f"{live_filter_stats['recebidos']} recebidos | -{live_filter_stats['liga']} por liga | "
+            f"-{live_filter_stats['reservas']} reservas/sub-XX ({', '.join(filtro)})")
+
 def get_live_fixtures() -> List[Dict[str, Any]]:
     try:
         url = f"{API_BASE}/fixtures"
-        params = {"live": "all"}
+        params = {"live": "-".join(map(str, sorted(LEAGUE_ALLOW))) if LEAGUE_ALLOW else "all"}
         data = safe_request(url, headers=HEADERS, params=params)
         if not data:
             logger.warning("⚠️ Erro ao buscar fixtures ao vivo (sem resposta ou falha na API)")
             return []
-        fixtures = data.get("response", [])
-        logger.debug("📡 %d partidas ao vivo encontradas.", len(fixtures))
+        fixtures = filtrar_e_projetar(data.get("response", []))
+        logger.debug("📡 %d partidas ao vivo encontradas (%s).", len(fixtures), live_filter_summary())
         return fixtures
     except Exception as e:
         logger.exception("Erro em get_live_fixtures: %s", e)
@@ -246,18 +1224,20 @@ def get_live_fixtures() -> List[Dict[str, Any]]:
 def get_fixture_statistics(fixture_id: int) -> Optional[List[Dict[str, Any]]]:
     try:
         now = time.time()
-        if fixture_id in no_stats_backoff_until and now < no_stats_backoff_until[fixture_id]:
+        state = fixture_state(fixture_id)
+        if now < state.backoff_until:
+            METRIC_STATS_BACKOFF.inc()
             return None
         url = f"{API_BASE}/fixtures/statistics"
         params = {"fixture": fixture_id}
         data = safe_request(url, headers=HEADERS, params=params)
         if not data:
-            no_stats_backoff_until[fixture_id] = now + 45  # backoff acelerado
+            state.backoff_until = now + 45  # backoff acelerado
             logger.warning("⚠️ Stats sem resposta. Backoff 45s para fixture=%s", fixture_id)
             return None
         stats = data.get("response", [])
         if not stats:
-            no_stats_backoff_until[fixture_id] = now + 45
+            state.backoff_until = now + 45
             logger.debug("Sem estatísticas para fixture=%s (backoff 45s).", fixture_id)
             return None
         return stats
@@ -265,37 +1245,141 @@ def get_fixture_statistics(fixture_id: int) -> Optional[List[Dict[str, Any]]]:
         logger.exception("Erro em get_fixture_statistics: %s", e)
         return None
 
+_stats_executor: Optional[ThreadPoolExecutor] = None
+
+def fetch_statistics_concurrently(fixture_ids: List[int]) -> Dict[int, Optional[List[Dict[str, Any]]]]:
+    """
+    Busca stats de vários jogos em paralelo (no máx. STATS_MAX_INFLIGHT em voo).
+    Cada chamada passa por get_fixture_statistics, então o backoff por fixture continua valendo.
+    """
+    global _stats_executor
+    if not fixture_ids:
+        return {}
+    if len(fixture_ids) == 1 or STATS_MAX_INFLIGHT == 1:
+        return {fid: get_fixture_statistics(fid) for fid in fixture_ids}
+    if _stats_executor is None:
+        _stats_executor = ThreadPoolExecutor(max_workers=STATS_MAX_INFLIGHT, thread_name_prefix="stats")
+    results = _stats_executor.map(get_fixture_statistics, fixture_ids)
+    return dict(zip(fixture_ids, results))
+
+def _get_fixtures_batch(fixture_ids: List[int]) -> Optional[List[Dict[str, Any]]]:
+    """Fixtures do lote, ou None se a chamada falhou (timeout, 429, 5xx)."""
+    data = safe_request(f"{API_BASE}/fixtures", headers=HEADERS, params={"ids": "-".join(map(str, fixture_ids))})
+    return None if data is None else data.get("response", [])
+
+def fetch_statistics_batched(fixture_ids: List[int]) -> Dict[int, Optional[List[Dict[str, Any]]]]:
+    """
+    Stats de vários jogos via /fixtures?ids= (até FIXTURES_IDS_MAX por chamada). Os blocos
+    `statistics` e `events` embutidos alimentam o memo da varredura, então o enriquecimento
+    (posse/cantos/acréscimos) não busca de novo. Quem veio num lote bem-sucedido sem stats cai
+    no caminho por jogo; lote que falhou fica sem stats até o próximo tick (não vira 20 chamadas).
+    """
+    global _stats_executor
+    now = time.time()
+    ids = [fid for fid in fixture_ids if now >= fixture_state(fid).backoff_until]
+    if len(ids) < len(fixture_ids):
+        METRIC_STATS_BACKOFF.inc(amount=len(fixture_ids) - len(ids))
+    out: Dict[int, Optional[List[Dict[str, Any]]]] = {fid: None for fid in fixture_ids}
+    if not ids:
+        return out
+    lotes = [ids[i:i + FIXTURES_IDS_MAX] for i in range(0, len(ids), FIXTURES_IDS_MAX)]
+    if len(lotes) > 1 and STATS_MAX_INFLIGHT > 1:
+        if _stats_executor is None:
+            _stats_executor = ThreadPoolExecutor(max_workers=STATS_MAX_INFLIGHT, thread_name_prefix="stats")
+        respostas = list(_stats_executor.map(_get_fixtures_batch, lotes))
+    else:
+        respostas = [_get_fixtures_batch(lote) for lote in lotes]
+
+    faltando = []
+    falhas = sum(1 for resposta in respostas if resposta is None)
+    for fx in (item for resposta in respostas if resposta for item in resposta):
+        fid = (fx.get("fixture") or {}).get("id")
+        if fid not in out:
+            continue
+        stats = fx.get("statistics") or []
+        if stats:
+            out[fid] = stats
+            _scan_memo_put(f"{API_BASE}/fixtures/statistics", {"fixture": fid}, {"response": stats})
+        else:
+            faltando.append(fid)
+        if fx.get("events") is not None:
+            _scan_memo_put(f"{API_BASE}/fixtures/events", {"fixture": fid}, {"response": fx["events"]})
+
+    if falhas:
+        logger.warning("⚠️ %d de %d lotes /fixtures?ids= falharam; esses jogos ficam para o próximo tick.",
+                       falhas, len(lotes))
+    if faltando:
+        logger.debug("Lote /fixtures?ids= sem stats para %d jogos; tentando por jogo.", len(faltando))
+        out.update(fetch_statistics_concurrently(faltando))
+    return out
+
 # ===================== EXTRACT STATS =====================
-STAT_ALIASES = {
-    'corners': ['corner', 'corners'],
-    'attacks': ['attack', 'attacks'],
-    'danger':  ['dangerous attack', 'dangerous attacks'],
-    'shots':   ['shot', 'shots', 'total shots', 'shots on target', 'shots on goal'],
-    'pos':     ['possession', 'ball possession']
+class TeamStats(TypedDict):
+    corners: int
+    attacks: int
+    danger: int
+    shots: int
+    pos: int
+
+# Rótulo exato da API-Football (campo `type`) -> campo do TeamStats.
+# "Shots on Goal", "Blocked Shots", "Shots insidebox" etc. NÃO entram em `shots`.
+STAT_LABEL_FIELDS = {
+    'Corner Kicks':      'corners',
+    'Attacks':           'attacks',
+    'Dangerous Attacks': 'danger',
+    'Total Shots':       'shots',
+    'Ball Possession':   'pos',
+}
+# Variações já vistas em outros provedores/versões (usadas só após normalizar)
+STAT_LABEL_VARIANTS = {
+    'corners': 'corners', 'corner': 'corners',
+    'attack': 'attacks',
+    'dangerous attack': 'danger',
+    'shots': 'shots', 'shots total': 'shots',
+    'possession': 'pos',
 }
 
-def extract_value(stat_type: str, stat_label: str, value) -> Optional[int]:
-    stat_label = (stat_label or '').lower()
-    for alias in STAT_ALIASES.get(stat_type, []):
-        if alias in stat_label:
-            try:
-                return int(float(str(value).replace('%', '').strip()))
-            except Exception:
-                return 0
-    return None
+def _normalize_stat_label(label: str) -> str:
+    return " ".join(str(label).replace("_", " ").lower().split())
 
-def extract_basic_stats(fixture: Dict[str, Any], stats_resp: List[Dict[str, Any]]):
+# Índice construído uma vez: rótulo exato primeiro, rótulo normalizado como fallback.
+# Rótulos resolvidos pelo fallback (inclusive os que não interessam -> None) ficam no
+# índice exato, então cada rótulo distinto é normalizado uma única vez.
+_STAT_INDEX_EXACT: Dict[Any, Optional[str]] = dict(STAT_LABEL_FIELDS)
+_STAT_INDEX_NORM: Dict[str, str] = {_normalize_stat_label(k): v for k, v in STAT_LABEL_FIELDS.items()}
+_STAT_INDEX_NORM.update(STAT_LABEL_VARIANTS)
+_STAT_INDEX_MAX = 512  # proteção contra rótulos inesperados em massa
+
+def stat_field_for_label(label: Any) -> Optional[str]:
+    try:
+        return _STAT_INDEX_EXACT[label]
+    except KeyError:
+        pass
+    except TypeError:  # rótulo não-hashable
+        return None
+    field = _STAT_INDEX_NORM.get(_normalize_stat_label(label)) if label else None
+    if len(_STAT_INDEX_EXACT) < _STAT_INDEX_MAX:
+        _STAT_INDEX_EXACT[label] = field
+    return field
+
+def _stat_int(value: Any) -> int:
+    if type(value) is int:
+        return value
+    try:
+        return int(float(str(value).replace('%', '').strip()))
+    except Exception:
+        return 0
+
+def extract_basic_stats(fixture: Dict[str, Any], stats_resp: List[Dict[str, Any]]) -> Tuple[TeamStats, TeamStats]:
     teams = fixture.get('teams', {})
     home_id = teams.get('home', {}).get('id')
     away_id = teams.get('away', {}).get('id')
 
-    home = {'corners': 0, 'attacks': 0, 'danger': 0, 'shots': 0, 'pos': 50}
-    away = {'corners': 0, 'attacks': 0, 'danger': 0, 'shots': 0, 'pos': 50}
+    home: TeamStats = {'corners': 0, 'attacks': 0, 'danger': 0, 'shots': 0, 'pos': 50}
+    away: TeamStats = {'corners': 0, 'attacks': 0, 'danger': 0, 'shots': 0, 'pos': 50}
 
     for entry in stats_resp or []:
-        team = entry.get('team', {}) or {}
-        stats_list = entry.get('statistics', []) or []
-        team_id = team.get('id')
+        team_id = (entry.get('team') or {}).get('id')
 
         if team_id == home_id:
             target = home
@@ -304,19 +1388,15 @@ def extract_basic_stats(fixture: Dict[str, Any], stats_resp: List[Dict[str, Any]
         else:
             continue
 
-        for s in stats_list:
-            label = str(s.get('type', '')).lower()
-            val = s.get('value')
-            for key in STAT_ALIASES.keys():
-                v = extract_value(key, label, val)
-                if v is not None:
-                    target[key] = v
-                    break
+        for s in entry.get('statistics') or []:
+            field = stat_field_for_label(s.get('type'))
+            if field is not None:
+                target[field] = _stat_int(s.get('value'))
 
     return home, away
 
 # ===================== PRESSURE VIP =====================
-def pressure_score_vip(home: Dict[str, int], away: Dict[str, int]) -> Tuple[float, float]:
+def pressure_score_vip(home: TeamStats, away: TeamStats) -> Tuple[float, float]:
     def norm(x, a):
         try:
             return max(0.0, min(1.0, x / float(a)))
@@ -399,12 +1479,356 @@ def verificar_estrategias_vip(fixture: Dict[str, Any], metrics: Dict[str, Any]):
                  cond_attacks, cond_danger, cond_pressure, cond_score, cond_window, true_count, len(estrategias))
     return estrategias, composite_ok
 
+# ================= ESTRATÉGIAS VIP EM LOTE (NumPy, mesmos resultados) =================
+# Ordem de avaliação idêntica à de verificar_estrategias_vip (a lista de saída respeita essa ordem).
+ESTRATEGIAS_VIP = (
+    "HT - Casa Empatando",
+    "FT - Reação da Casa",
+    "FT - Over Cantos 2º Tempo",
+    "Campo Pequeno + Pressão",
+    "Jogo Aberto (Ambos pressionam)",
+    "Favorito em Perigo (Casa)",
+    "Favorito em Perigo (Fora)",
+    "Pressão Mandante Dominante",
+    "Jogo Vivo Sem Cantos",
+    "Jogo Travado (Under Corner Asiático)",
+    "Pressão Alternada (Ambos Atacando)",
+)
+
+# Colunas do lote (uma linha por jogo)
+LOTE_COLUNAS = ("minute", "home_goals", "away_goals",
+                "home_corners", "away_corners", "home_attacks", "away_attacks",
+                "home_danger", "away_danger", "home_shots", "away_shots",
+                "home_pos", "away_pos", "small_stadium")
+
+def montar_metricas_vip(fixture: Dict[str, Any], minute: float, home: TeamStats, away: TeamStats) -> Dict[str, Any]:
+    """Dicionário de métricas consumido por verificar_estrategias_vip e pela mensagem."""
+    press_home, press_away = pressure_score_vip(home, away)
+    return {
+        'minute': minute,
+        'home_corners': home['corners'], 'away_corners': away['corners'],
+        'home_attacks': home['attacks'], 'away_attacks': away['attacks'],
+        'home_danger': home['danger'], 'away_danger': away['danger'],
+        'home_shots': home['shots'], 'away_shots': away['shots'],
+        'home_pos': home['pos'], 'away_pos': away['pos'],
+        'press_home': press_home, 'press_away': press_away,
+        'small_stadium': (fixture.get('fixture', {}).get('venue', {}).get('name', '').lower() in SMALL_STADIUMS),
+        'total_corners': (home['corners'] or 0) + (away['corners'] or 0),
+        'total_shots': (home['shots'] or 0) + (away['shots'] or 0)
+    }
+
+def empacotar_lote_vip(fixtures: List[Dict[str, Any]], metrics_list: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Converte N (fixture, metrics) em colunas float64 (small_stadium como bool)."""
+    def col(values) -> np.ndarray:
+        return np.array(values, dtype=np.float64)
+
+    goals = [fx.get('goals', {}) for fx in fixtures]
+    cols = {
+        "minute": col([m['minute'] for m in metrics_list]),
+        "home_goals": col([g.get('home', 0) or 0 for g in goals]),
+        "away_goals": col([g.get('away', 0) or 0 for g in goals]),
+        "small_stadium": np.array([bool(m['small_stadium']) for m in metrics_list], dtype=bool),
+    }
+    for c in LOTE_COLUNAS[3:-1]:
+        cols[c] = col([m[c] or 0 for m in metrics_list])
+    return cols
+
+def pressure_score_batch(cols: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Versão vetorizada de pressure_score_vip (mesma fórmula, mesma ordem de soma)."""
+    def norm(x, a):
+        return np.maximum(0.0, np.minimum(1.0, x / float(a)))
+
+    ha, aa = cols["home_attacks"], cols["away_attacks"]
+    hd, ad = cols["home_danger"], cols["away_danger"]
+    hs, as_ = cols["home_shots"], cols["away_shots"]
+    hp, ap = cols["home_pos"], cols["away_pos"]
+    h = (0.25 * norm(ha - aa, 10) + 0.45 * norm(hd - ad, 8) +
+         0.20 * norm(hs - as_, 4) + 0.10 * norm(hp - ap, 20))
+    a = (0.25 * norm(aa - ha, 10) + 0.45 * norm(ad - hd, 8) +
+         0.20 * norm(as_ - hs, 4) + 0.10 * norm(ap - hp, 20))
+    vazio = ((ha + aa) < 1) | ((hd + ad) < 1)
+    return np.where(vazio, 0.0, h), np.where(vazio, 0.0, a)
+
+def verificar_estrategias_batch(cols: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Avalia TODAS as estratégias para o lote numa passada vetorizada.
+    Retorna (matriz bool N×len(ESTRATEGIAS_VIP), composite_ok[N], press_home[N], press_away[N]).
+    Serve tanto para o loop ao vivo quanto para backtests (basta montar as colunas).
+    """
+    press_home, press_away = pressure_score_batch(cols)
+    minuto = cols["minute"]
+    hg, ag = cols["home_goals"], cols["away_goals"]
+    hd, ad = cols["home_danger"], cols["away_danger"]
+    hs, as_ = cols["home_shots"], cols["away_shots"]
+    hp, ap = cols["home_pos"], cols["away_pos"]
+    total_cantos = cols["home_corners"] + cols["away_corners"]
+    press_max = np.maximum(press_home, press_away)
+    danger_sum = hd + ad
+    shots_sum = hs + as_
+    em_ht = (HT_WINDOW[0] <= minuto) & (minuto <= HT_WINDOW[1])
+    em_ft = (FT_WINDOW[0] <= minuto) & (minuto <= FT_WINDOW[1])
+    faixa_favorito = (35 <= minuto) & (minuto <= 79.8)
+
+    hits = np.column_stack([
+        em_ht & (hg == ag) & (press_home >= MIN_PRESSURE_SCORE),
+        (70 <= minuto) & (minuto <= 86.8) & (hg < ag) & (press_home >= MIN_PRESSURE_SCORE),
+        (70 <= minuto) & (minuto <= 88.8) & (press_max >= MIN_PRESSURE_SCORE) & (total_cantos <= 8),
+        cols["small_stadium"] & (press_max >= MIN_PRESSURE_SCORE) & (25 <= minuto) & (minuto <= 89.8),
+        (minuto >= 30) & (press_home >= 0.30) & (press_away >= 0.30),
+        faixa_favorito & (press_home > press_away + 0.10) & (hg < ag),
+        faixa_favorito & (press_away > press_home + 0.10) & (ag < hg),
+        (press_home >= 1.36) & (hd >= 5.8) & (hp >= 59.5) & (hg <= ag) & (18.8 <= minuto) & (minuto <= 38.6),
+        (total_cantos <= 4.3) & (danger_sum >= 9.4) & (shots_sum >= 1.8) &
+        (press_home < 1.95) & (press_away < 1.95) & (minuto <= 43.8),
+        (shots_sum < 4.8) & (np.abs(hp - ap) <= 9.8) & (danger_sum < 4.7) & (minuto >= 24.5),
+        (press_home >= 1.18) & (press_away >= 1.18) & (danger_sum >= 9.6) & (shots_sum >= 4.6) &
+        (19.5 <= minuto) & (minuto <= 79.5),
+    ]) if len(minuto) else np.zeros((0, len(ESTRATEGIAS_VIP)), dtype=bool)
+
+    cond_attacks = (cols["home_attacks"] + cols["away_attacks"]) >= ATTACKS_MIN_SUM
+    cond_danger = danger_sum >= DANGER_MIN_SUM
+    cond_pressure = press_max >= MIN_PRESSURE_SCORE
+    cond_score = (hg == ag) | ((press_home > press_away) & (hg < ag)) | ((press_away > press_home) & (ag < hg))
+    cond_window = em_ht | em_ft
+    true_count = (cond_attacks.astype(np.int8) + cond_danger + cond_pressure + cond_score + cond_window)
+    return hits, true_count >= 2, press_home, press_away
+
+def avaliar_lote_vip(fixtures: List[Dict[str, Any]], metrics_list: List[Dict[str, Any]]) -> List[Tuple[List[str], bool]]:
+    """Mesmo contrato de verificar_estrategias_vip, para N jogos de uma vez."""
+    if not metrics_list:
+        return []
+    hits, composite, _, _ = verificar_estrategias_batch(empacotar_lote_vip(fixtures, metrics_list))
+    nomes = ESTRATEGIAS_VIP
+    tem_hit = hits.any(axis=1).tolist()
+    return [([n for n, h in zip(nomes, row) if h] if algum else [], ok)
+            for row, algum, ok in zip(hits.tolist(), tem_hit, composite.tolist())]
+
+# ========================= REGISTRO DE JOGOS ==========================
+class FixtureState:
+    """Estado por jogo do scanner (substitui os antigos dicts soltos por fixture_id)."""
+    __slots__ = ("sent_period", "sent_signals", "last_elapsed", "backoff_until", "next_poll", "last_seen",
+                 "last_status", "serie", "cantos_ht")
+
+    def __init__(self) -> None:
+        self.sent_period: set = set()                 # {"HT","FT"} já sinalizados
+        self.sent_signals: Dict[str, float] = {}      # signal_key -> último envio (anti-spam)
+        self.last_elapsed = 0.0                       # suavização do minuto
+        self.backoff_until = 0.0                      # sem pedir stats até este instante
+        self.next_poll = 0.0                          # próximo poll de stats (prioridade por janela)
+        self.last_seen = time.time()                  # última vez no live=all
+        self.last_status = ""                         # status.short visto no último live=all
+        self.serie: Optional[SerieStats] = None       # ritmo recente (criada com o primeiro stats)
+        self.cantos_ht: Optional[int] = None          # total de cantos visto com status HT (liquida o sinal HT)
+
+# Colunas da série: totais cumulativos como vêm do extract_basic_stats
+SERIE_COLUNAS = ("corners_h", "corners_a", "danger_h", "danger_a", "shots_h", "shots_a")
+
+class SerieStats:
+    """
+    Ring buffer de tamanho fixo (array 'f') com snapshots cumulativos por minuto suavizado.
+    `base` aponta o snapshot mais novo com minuto <= atual - MOMENTUM_WINDOW e só anda para a
+    frente, então registrar() e ritmo() são O(1) amortizado. ~0,7 KB por jogo com 16 slots (732 bytes via nbytes()).
+    """
+    __slots__ = ("minutos", "valores", "inicio", "n", "base")
+
+    def __init__(self, slots: int = MOMENTUM_SLOTS) -> None:
+        self.minutos = array('f', bytes(4 * slots))
+        self.valores = array('f', bytes(4 * slots * len(SERIE_COLUNAS)))
+        self.inicio = 0   # posição física do snapshot mais antigo
+        self.n = 0        # snapshots válidos
+        self.base = 0     # posição lógica (0..n-1) do snapshot-base da janela
+
+    def _pos(self, i: int) -> int:
+        return (self.inicio + i) % len(self.minutos)
+
+    def registrar(self, minuto: float, linha: Tuple[int, ...]) -> None:
+        k = len(SERIE_COLUNAS)
+        if self.n and minuto <= self.minutos[self._pos(self.n - 1)]:
+            j = self._pos(self.n - 1)   # mesmo minuto (suavizado): atualiza o último snapshot
+        else:
+            if self.n == len(self.minutos):
+                self.inicio = (self.inicio + 1) % len(self.minutos)
+                self.n -= 1
+                self.base = max(0, self.base - 1)
+            j = self._pos(self.n)
+            self.n += 1
+            self.minutos[j] = minuto
+        self.valores[j * k:(j + 1) * k] = array('f', linha)
+        corte = minuto - MOMENTUM_WINDOW
+        while self.base + 1 < self.n - 1 and self.minutos[self._pos(self.base + 1)] <= corte:
+            self.base += 1
+
+    def ritmo(self) -> Dict[str, float]:
+        """Eventos nos últimos MOMENTUM_WINDOW minutos (proporcional se a base for mais antiga)."""
+        if self.n < 2:
+            return {}
+        k = len(SERIE_COLUNAS)
+        u, b = self._pos(self.n - 1) * k, self._pos(self.base) * k
+        span = self.minutos[self._pos(self.n - 1)] - self.minutos[self._pos(self.base)]
+        if span <= 0:
+            return {}
+        fator = min(1.0, MOMENTUM_WINDOW / span)
+        d = [max(0.0, self.valores[u + c] - self.valores[b + c]) * fator for c in range(k)]
+        return {"ritmo_cantos": d[0] + d[1], "ritmo_perigo_casa": d[2], "ritmo_perigo_fora": d[3],
+                "ritmo_chutes": d[4] + d[5], "ritmo_janela": min(span, MOMENTUM_WINDOW)}
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.minutos) + sys.getsizeof(self.valores)
+
+def atualizar_serie(fixture_id: int, minute: float, home: TeamStats, away: TeamStats) -> Dict[str, float]:
+    """Anexa o snapshot do tick à série do jogo e devolve o ritmo recente (vazio até haver 2 minutos)."""
+    st = fixture_state(fixture_id)
+    if st.serie is None:
+        st.serie = SerieStats()
+    st.serie.registrar(minute, (home['corners'], away['corners'], home['danger'], away['danger'],
+                                home['shots'], away['shots']))
+    return st.serie.ritmo()
+
+_fixture_states: "OrderedDict[int, FixtureState]" = OrderedDict()   # ordem = LRU
+_fixture_states_lock = threading.Lock()
+fixture_states_evicted = 0
+
+def fixture_state(fixture_id: int) -> FixtureState:
+    """Registro do jogo (criado sob demanda). Respeita o teto FIXTURE_STATE_MAX (LRU)."""
+    global fixture_states_evicted
+    st = _fixture_states.get(fixture_id)
+    if st is not None:
+        return st
+    with _fixture_states_lock:
+        st = _fixture_states.get(fixture_id)
+        if st is None:
+            st = _fixture_states[fixture_id] = FixtureState()
+            while len(_fixture_states) > FIXTURE_STATE_MAX:
+                _fixture_states.popitem(last=False)
+                fixture_states_evicted += 1
+    return st
+
+def prune_fixture_states(fixtures: List[Dict[str, Any]], now: Optional[float] = None) -> int:
+    """
+    Atualiza last_seen de quem segue no live=all e despeja quem terminou (FT etc.)
+    ou sumiu da lista há mais de FIXTURE_STATE_GRACE segundos. Retorna quantos saíram.
+    """
+    global fixture_states_evicted
+    now = time.time() if now is None else now
+    finished = set()
+    with _fixture_states_lock:
+        for fx in fixtures:
+            info = fx.get("fixture", {}) or {}
+            fid = info.get("id")
+            st = _fixture_states.get(fid)
+            if st is None:
+                continue
+            st.last_status = (info.get("status") or {}).get("short") or ""
+            if st.last_status in FINISHED_STATUSES:
+                finished.add(fid)
+            st.last_seen = now
+            _fixture_states.move_to_end(fid)
+        stale = [fid for fid, st in _fixture_states.items()
+                 if fid in finished or now - st.last_seen > FIXTURE_STATE_GRACE]
+        for fid in stale:
+            del _fixture_states[fid]
+        fixture_states_evicted += len(stale)
+    return len(stale)
+
+def fixture_registry_stats() -> Dict[str, int]:
+    with _fixture_states_lock:
+        estados = list(_fixture_states.values())
+    mem = sys.getsizeof(_fixture_states)
+    for st in estados:
+        mem += (sys.getsizeof(st) + sys.getsizeof(st.sent_period) + sys.getsizeof(st.sent_signals) +
+                sum(sys.getsizeof(k) for k in st.sent_signals) + (st.serie.nbytes() if st.serie else 0))
+    return {"live": len(estados), "evicted": fixture_states_evicted, "approx_bytes": mem}
+
+# ===================== SNAPSHOT DO SCANNER (WARM START) =====================
+# O registro por jogo (períodos/sinais já enviados, minuto suavizado, backoff, próximo poll)
+# é salvo a cada STATE_SNAPSHOT_INTERVAL em JSON gzip (tmp + fsync + rename atômico) e
+# recarregado no boot. Jogos que não vierem no primeiro live=all saem no primeiro prune.
+# A série de ritmo não entra: se refaz em poucos ticks.
+estado_restaurado = 0
+_estado_salvo_em = 0.0
+_scanner_iniciado = False   # a saída só grava snapshot se o main_loop chegou a rodar
+
+def _estado_para_dict() -> Dict[str, Any]:
+    with _fixture_states_lock:
+        itens = list(_fixture_states.items())
+    return {"v": 1, "salvo_em": time.time(), "jogos": {
+        str(fid): [sorted(st.sent_period), st.sent_signals, st.last_elapsed, st.backoff_until,
+                   st.next_poll, st.last_status]
+        for fid, st in itens}}
+
+def salvar_estado(path: str = None) -> int:
+    """Grava o snapshot de forma atômica. Retorna quantos jogos foram salvos."""
+    global _estado_salvo_em
+    path = path or STATE_SNAPSHOT_PATH
+    dados = _estado_para_dict()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as gz:
+            gz.write(json.dumps(dados, separators=(",", ":")).encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    _estado_salvo_em = time.monotonic()
+    return len(dados["jogos"])
+
+def salvar_estado_se_preciso() -> None:
+    if STATE_SNAPSHOT_INTERVAL <= 0 or BOT_MODE == "replay":
+        return
+    if time.monotonic() - _estado_salvo_em >= STATE_SNAPSHOT_INTERVAL:
+        try:
+            salvar_estado()
+        except Exception as e:
+            logger.warning("Falha ao salvar snapshot do scanner: %s", e)
+
+def carregar_estado(path: str = None) -> int:
+    """Restaura o registro a partir do snapshot (se existir e for recente). Retorna quantos jogos voltaram."""
+    global estado_restaurado
+    path = path or STATE_SNAPSHOT_PATH
+    if STATE_SNAPSHOT_INTERVAL <= 0 or BOT_MODE == "replay" or not os.path.exists(path):
+        return 0
+    t0 = time.perf_counter()
+    try:
+        with gzip.open(path, "rb") as gz:
+            dados = json.loads(gz.read().decode("utf-8"))
+    except Exception as e:
+        logger.warning("Snapshot do scanner ilegível (%s): %s. Partida a frio.", path, e)
+        return 0
+    idade = time.time() - float(dados.get("salvo_em", 0))
+    if idade > STATE_SNAPSHOT_MAX_AGE:
+        logger.info("Snapshot do scanner com %.0f min; velho demais, ignorado.", idade / 60)
+        return 0
+    with _fixture_states_lock:
+        for fid, (periodos, sinais, elapsed, backoff, next_poll, status) in dados.get("jogos", {}).items():
+            st = FixtureState()
+            st.sent_period = set(periodos)
+            st.sent_signals = {k: float(v) for k, v in sinais.items()}
+            st.last_elapsed, st.backoff_until, st.next_poll = float(elapsed), float(backoff), float(next_poll)
+            st.last_status = status
+            st.last_seen = 0.0   # a confirmar: quem não vier no 1º live=all sai no primeiro prune
+            _fixture_states[int(fid)] = st
+        while len(_fixture_states) > FIXTURE_STATE_MAX:
+            _fixture_states.popitem(last=False)
+    estado_restaurado = len(dados.get("jogos", {}))
+    logger.info("♻️ Warm start: %d jogos restaurados de %s (snapshot de %.0fs atrás, %.1f ms).",
+                estado_restaurado, path, idade, (time.perf_counter() - t0) * 1000)
+    return estado_restaurado
+
+def _salvar_estado_na_saida() -> None:
+    if STATE_SNAPSHOT_INTERVAL > 0 and BOT_MODE != "replay" and _scanner_iniciado:
+        try:
+            salvar_estado()
+        except Exception:
+            pass
+
+atexit.register(_salvar_estado_na_saida)
+
 # ========================= ANTI-SPAM ==========================
 def should_notify(fixture_id: int, signal_key: str) -> bool:
     now = time.time()
-    last = sent_signals[fixture_id].get(signal_key, 0)
+    sent = fixture_state(fixture_id).sent_signals
+    last = sent.get(signal_key, 0)
     if now - last >= RENOTIFY_MINUTES * 60:
-        sent_signals[fixture_id][signal_key] = now
+        sent[signal_key] = now
         return True
     return False
 
@@ -444,11 +1868,17 @@ def _read_json_fast(url: str, headers: dict, timeout=8) -> dict:
     """
     Faz um GET rápido e seguro.
     Retorna {} se houver erro de rede, timeout ou código diferente de 200.
+    Dentro de uma varredura, reaproveita respostas já buscadas (memo por endpoint+params).
     """
+    cached = _scan_memo_get(url)
+    if cached is not None:
+        return cached
     try:
-        r = requests.get(url, headers=headers, timeout=timeout)
+        r = api_get(url, headers=headers, timeout=timeout)
         if r.status_code == 200:
-            return r.json()
+            data = r.json()
+            _scan_memo_put(url, None, data)
+            return data
         return {}
     except Exception:
         return {}
@@ -463,11 +1893,77 @@ def _is_probably_reserve_or_uX(league_name: str) -> bool:
     bad = ["u21", "u20", "u19", "reserva", "reserve", "amistoso", "friendly", "women", "sub-"]
     return any(t in ln for t in bad)
 
-def coletar_dados_completos_vip_nasa(fixture_id: int, headers: dict, api_base: str) -> Dict[str, Any]:
+# ===================== VIP NASA: CACHE DE ENRIQUECIMENTO =====================
+# (league_id, season) -> (expira_em, {team_id: rank}); LRU limitado a ENRICH_CACHE_MAX entradas.
+_enrich_cache: "OrderedDict[Tuple[int, int], Tuple[float, Dict[int, int]]]" = OrderedDict()
+_enrich_cache_lock = threading.Lock()
+enrich_cache_hits = 0
+enrich_cache_misses = 0
+
+def _enrich_cache_get(key: Tuple[int, int]) -> Optional[Dict[int, int]]:
+    global enrich_cache_hits, enrich_cache_misses
+    now = time.time()
+    with _enrich_cache_lock:
+        item = _enrich_cache.get(key)
+        if item is not None and item[0] > now:
+            _enrich_cache.move_to_end(key)
+            enrich_cache_hits += 1
+            return item[1]
+        if item is not None:
+            del _enrich_cache[key]  # expirado
+        enrich_cache_misses += 1
+        return None
+
+def _enrich_cache_put(key: Tuple[int, int], value: Dict[int, int]) -> None:
+    with _enrich_cache_lock:
+        _enrich_cache[key] = (time.time() + ENRICH_CACHE_TTL, value)
+        _enrich_cache.move_to_end(key)
+        while len(_enrich_cache) > ENRICH_CACHE_MAX:
+            _enrich_cache.popitem(last=False)
+
+def enrich_cache_summary() -> str:
+    consultas = enrich_cache_hits + enrich_cache_misses
+    ratio = (enrich_cache_hits / consultas * 100) if consultas else 0.0
+    return (f"{len(_enrich_cache)}/{ENRICH_CACHE_MAX} ligas | hits {enrich_cache_hits} / "
+            f"misses {enrich_cache_misses} ({ratio:.0f}%)")
+
+def get_standings_ranks(league_id: int, season: int, headers: dict, api_base: str,
+                        allow_fetch: bool = True) -> Dict[int, int]:
+    """
+    Ranks {team_id: posição} da liga/temporada, via cache TTL/LRU.
+    Só a primeira consulta (ou após expirar) gasta requisição; falha de rede ou resposta com
+    `errors` não é cacheada.
+    Com allow_fetch=False (modo economia) só responde do cache.
+    """
+    key = (league_id, season)
+    ranks = _enrich_cache_get(key)
+    if ranks is not None or not allow_fetch:
+        return ranks or {}
+
+    st = _read_json_fast(f"{api_base}/standings?league={league_id}&season={season}", headers)
+    if not st:
+        return {}
+    ranks = {}
+    try:
+        for resp in st.get("response") or []:
+            for table in resp["league"]["standings"]:
+                for row in table:
+                    ranks[row["team"]["id"]] = row["rank"]
+    except Exception:
+        pass
+    # Ligas sem tabela (copas) também ficam em cache: a resposta vazia não muda durante o dia.
+    # Já o HTTP 200 com `errors` (cota esgotada, limite do plano) não: a próxima consulta tenta de novo.
+    if not st.get("errors"):
+        _enrich_cache_put(key, ranks)
+    return ranks
+
+def coletar_dados_completos_vip_nasa(fixture_id: int, headers: dict, api_base: str,
+                                     match: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Coleta dados premium:
     - Odds 1x2 (bookmaker=8 Bet365), Standings (home_rank/away_rank),
       Posse e Cantos (live), Acréscimos via events, Selo de verificação e filtro de liga.
+    - Se `match` (fixture do live=all) for passado, não busca /fixtures?id= de novo.
     """
     out = {
         "home_rank": "–", "away_rank": "–",
@@ -480,11 +1976,12 @@ def coletar_dados_completos_vip_nasa(fixture_id: int, headers: dict, api_base: s
         "bookmaker_ok": False
     }
 
-    fx = _read_json_fast(f"{api_base}/fixtures?id={fixture_id}", headers)
-    if not fx.get("response"):
-        return out
+    if not match:
+        fx = _read_json_fast(f"{api_base}/fixtures?id={fixture_id}", headers)
+        if not fx.get("response"):
+            return out
+        match = fx["response"][0]
 
-    match = fx["response"][0]
     league = match.get("league", {}) or {}
     league_id = league.get("id")
     league_name = league.get("name", "")
@@ -497,9 +1994,10 @@ def coletar_dados_completos_vip_nasa(fixture_id: int, headers: dict, api_base: s
     away_id = away.get("id")
 
     out["liga_confiavel"] = not _is_probably_reserve_or_uX(league_name)
+    economia = quota_skip_enrichment()  # cota apertada: sem odds/standings novos/eventos
 
     # Odds Bet365
-    odds = _read_json_fast(f"{api_base}/odds?fixture={fixture_id}&bookmaker=8", headers)
+    odds = {} if economia else _read_json_fast(f"{api_base}/odds?fixture={fixture_id}&bookmaker=8", headers)
     try:
         if odds.get("response"):
             book = odds["response"][0]["bookmakers"][0]
@@ -514,18 +2012,11 @@ def coletar_dados_completos_vip_nasa(fixture_id: int, headers: dict, api_base: s
 
     # Standings
     if league_id and season:
-        st = _read_json_fast(f"{api_base}/standings?league={league_id}&season={season}", headers)
-        try:
-            groups = st["response"][0]["league"]["standings"]
-            for table in groups:
-                for row in table:
-                    tid = row["team"]["id"]
-                    if tid == home_id:
-                        out["home_rank"] = f"{row['rank']}º"
-                    if tid == away_id:
-                        out["away_rank"] = f"{row['rank']}º"
-        except Exception:
-            pass
+        ranks = get_standings_ranks(league_id, season, headers, api_base, allow_fetch=not economia)
+        if home_id in ranks:
+            out["home_rank"] = f"{ranks[home_id]}º"
+        if away_id in ranks:
+            out["away_rank"] = f"{ranks[away_id]}º"
 
     # Estatísticas ao vivo
     st_live = _read_json_fast(f"{api_base}/fixtures/statistics?fixture={fixture_id}", headers)
@@ -556,7 +2047,8 @@ def coletar_dados_completos_vip_nasa(fixture_id: int, headers: dict, api_base: s
         pass
 
     # Acréscimos
-    ev = _read_json_fast(f"{api_base}/fixtures/events?fixture={fixture_id}", headers)
+    ev_url = f"{api_base}/fixtures/events?fixture={fixture_id}"
+    ev = (_scan_memo_get(ev_url) or {}) if economia else _read_json_fast(ev_url, headers)
     try:
         extra_max = None
         for e in ev.get("response", []):
@@ -574,22 +2066,7 @@ def coletar_dados_completos_vip_nasa(fixture_id: int, headers: dict, api_base: s
         out["dados_verificados"] = True
 
     return out
-# === Função auxiliar: buscar eventos da partida ===
-def get_fixture_events(fixture_id: int) -> List[Dict[str, Any]]:
-    """
-    Busca os eventos da partida (faltas, substituições, cartões, gols)
-    usados para estimar acréscimos.
-    """
-    try:
-        url = f"{API_BASE}/fixtures/events"
-        params = {"fixture": fixture_id}
-        data = safe_request(url, headers=HEADERS, params=params)
-        if data and data.get("response"):
-            return data["response"]
-        return []
-    except Exception as e:
-        logger.warning(f"⚠️ Erro ao buscar eventos da fixture {fixture_id}: {e}")
-        return []
+
 # === Funções auxiliares para acréscimos inteligentes ===
 def get_fixture_events(fixture_id: int) -> List[Dict[str, Any]]:
     """
@@ -597,7 +2074,7 @@ def get_fixture_events(fixture_id: int) -> List[Dict[str, Any]]:
     """
     try:
         url = f"{API_BASE}/fixtures/events?fixture={fixture_id}"
-        data = _read_json_fast(url, HEADERS)
+        data = (_scan_memo_get(url) or {}) if quota_skip_enrichment() else _read_json_fast(url, HEADERS)
         if data and data.get("response"):
             return data["response"]
         return []
@@ -679,7 +2156,8 @@ def build_signal_message_vip(match, estrategias, stats):
     """
     try:
         fixture_id = match["fixture"]["id"]
-        enriched = coletar_dados_completos_vip_nasa(fixture_id, HEADERS, API_BASE)
+        with span("enriquecimento"):
+            enriched = coletar_dados_completos_vip_nasa(fixture_id, HEADERS, API_BASE, match=match)
 
         # Mescla com prioridade adequada (protege rank e dados enriquecidos)
         full = dict(enriched)
@@ -689,7 +2167,8 @@ def build_signal_message_vip(match, estrategias, stats):
             if v not in (None, "", "?", "-"):
                 full[k] = v
 
-        return formatar_mensagem_vip_nasa(match, estrategias, full)
+        with span("mensagem"):
+            return formatar_mensagem_vip_nasa(match, estrategias, full)
 
     except Exception as e:
         try:
@@ -697,6 +2176,116 @@ def build_signal_message_vip(match, estrategias, stats):
         except Exception:
             return f"<b>Alerta Estratégia:</b> falha ao montar mensagem ({_html(e)})"
 
+# ===================== ASSINANTES (FAN-OUT) =====================
+# Uma varredura serve N chats: cada sinal é avaliado uma vez, os filtros de cada chat são só
+# comparações sobre o resultado, e a mensagem é montada uma vez por template (o enriquecimento
+# — odds/standings/eventos — sai uma vez por sinal). A entrega fica com a fila do Telegram,
+# que já respeita o limite global e o de cada chat.
+SUBSCRIBERS_FILE = os.getenv("SUBSCRIBERS_FILE", "assinantes.json")
+TEMPLATES_SINAL = ("vip", "compacto")
+
+class Assinante(TypedDict):
+    chat_id: str
+    nome: str
+    ligas: frozenset          # vazio = todas
+    periodos: frozenset       # vazio = HT e FT
+    min_estrategias: int
+    template: str
+
+_assinantes_cache: Tuple[float, List[Assinante]] = (-1.0, [])
+fanout_stats = {"sinais": 0, "entregas": 0, "sem_destino": 0, "renderizacoes": 0}
+
+def _assinante_padrao() -> List[Assinante]:
+    return [Assinante(chat_id=str(TELEGRAM_CHAT_ID), nome="principal", ligas=frozenset(),
+                      periodos=frozenset(), min_estrategias=0, template="vip")]
+
+def _parse_assinante(item: Dict[str, Any]) -> Assinante:
+    template = str(item.get("template") or "vip").lower()
+    if template not in TEMPLATES_SINAL:
+        raise ValueError(f"template desconhecido: {template}")
+    return Assinante(chat_id=str(item["chat_id"]), nome=str(item.get("nome") or item["chat_id"]),
+                     ligas=frozenset(int(x) for x in item.get("ligas") or ()),
+                     periodos=frozenset(str(x).upper() for x in item.get("periodos") or ()),
+                     min_estrategias=int(item.get("min_estrategias") or 0), template=template)
+
+def assinantes() -> List[Assinante]:
+    """Registro de assinantes (cache por mtime do SUBSCRIBERS_FILE; arquivo inválido mantém o anterior)."""
+    global _assinantes_cache
+    try:
+        mtime = os.stat(SUBSCRIBERS_FILE).st_mtime
+    except OSError:
+        mtime = 0.0
+    if mtime == _assinantes_cache[0]:
+        return _assinantes_cache[1]
+    if not mtime:
+        lista = _assinante_padrao()
+    else:
+        try:
+            with open(SUBSCRIBERS_FILE, "r", encoding="utf-8") as f:
+                lista = [_parse_assinante(item) for item in json.load(f)]
+            logger.info("📬 %d assinantes carregados de %s.", len(lista), SUBSCRIBERS_FILE)
+        except Exception as e:
+            logger.error("❌ %s inválido (%s). Mantendo a lista anterior.", SUBSCRIBERS_FILE, e)
+            lista = _assinantes_cache[1] or _assinante_padrao()
+    _assinantes_cache = (mtime, lista)
+    return lista
+
+def destinos_do_sinal(fixture: Dict[str, Any], estrategias: list, periodo: str) -> Dict[str, List[str]]:
+    """template -> chats cujos filtros aceitam o sinal."""
+    league_id = (fixture.get("league") or {}).get("id")
+    por_template: Dict[str, List[str]] = {}
+    for a in assinantes():
+        if a["ligas"] and league_id not in a["ligas"]:
+            continue
+        if a["periodos"] and periodo not in a["periodos"]:
+            continue
+        if len(estrategias) < a["min_estrategias"]:
+            continue
+        por_template.setdefault(a["template"], []).append(a["chat_id"])
+    return por_template
+
+def formatar_mensagem_compacta(match: Dict[str, Any], estrategias: list, st: Dict[str, Any]) -> str:
+    periodo, tempo_fmt = _periodo_e_tempo(match)
+    estrategias_txt = " • ".join(estrategias) if estrategias else "Setup válido (2/5)"
+    return (f"⛳ <b>Asiáticos/Limite - {periodo}</b> | {_html(tempo_fmt)}\n"
+            f"{_html(match['teams']['home']['name'])} {_html(match['goals']['home'])} x "
+            f"{_html(match['goals']['away'])} {_html(match['teams']['away']['name'])} "
+            f"({_html(match['league']['name'])})\n"
+            f"Cantos {_html(st.get('home_corners', '?'))} - {_html(st.get('away_corners', '?'))} | "
+            f"{_html(estrategias_txt)}")
+
+def enviar_sinal(fixture: Dict[str, Any], estrategias: list, metrics: Dict[str, Any], periodo: str) -> int:
+    """Renderiza uma vez por template e enfileira para cada chat. Retorna quantos chats receberam."""
+    destinos = destinos_do_sinal(fixture, estrategias, periodo)
+    fanout_stats["sinais"] += 1
+    if not destinos:
+        fanout_stats["sem_destino"] += 1
+        logger.info("📭 Sinal fixture=%s (%s) sem assinante com filtro compatível.",
+                    (fixture.get("fixture") or {}).get("id"), periodo)
+        return 0
+    entregas = 0
+    for template, chats in destinos.items():
+        if template == "vip":
+            texto = build_signal_message_vip(fixture, estrategias, metrics)
+        else:
+            with span("mensagem"):
+                texto = formatar_mensagem_compacta(fixture, estrategias, metrics)
+        fanout_stats["renderizacoes"] += 1
+        with span("telegram"):
+            for chat_id in chats:
+                _tg_send(chat_id, texto, parse_mode="HTML", disable_web_page_preview=True)
+        METRIC_FANOUT.inc(template, amount=len(chats))
+        entregas += len(chats)
+    fanout_stats["entregas"] += entregas
+    return entregas
+
+def fanout_summary() -> str:
+    lista = assinantes()
+    templates = Counter(a["template"] for a in lista)
+    return (f"{len(lista)} chats ({', '.join(f'{t} {n}' for t, n in sorted(templates.items()))}) | "
+            f"sinais {fanout_stats['sinais']} → entregas {fanout_stats['entregas']} | "
+            f"renderizações {fanout_stats['renderizacoes']} | sem destino {fanout_stats['sem_destino']}")
+
 # ========================= UTIL: MINUTO/PERÍODO =========================
 def get_period_by_window(minute: float) -> Optional[str]:
     """Retorna 'HT' se dentro da janela HT, 'FT' se dentro da janela FT, ou None se fora de ambas."""
@@ -706,16 +2295,56 @@ def get_period_by_window(minute: float) -> Optional[str]:
         return "FT"
     return None
 
+def minutes_to_window_close(minute: float) -> Optional[float]:
+    """Minutos até a janela atual (HT/FT) fechar; None se fora de janela."""
+    for start, end in (HT_WINDOW, FT_WINDOW):
+        if start <= minute <= end:
+            return end - minute
+    return None
+
+def poll_gap_seconds(minute: float) -> float:
+    """
+    Intervalo até o próximo poll de stats de um jogo na janela: quem está nos
+    últimos POLL_URGENT_MIN minutos é consultado todo tick; quem acabou de entrar
+    espera proporcionalmente ao tempo que ainda falta (até POLL_MAX_GAP).
+    """
+    to_close = minutes_to_window_close(minute)
+    if to_close is None or to_close <= POLL_URGENT_MIN:
+        return 0.0
+    return min(POLL_MAX_GAP, (to_close - POLL_URGENT_MIN) * 60.0 * POLL_GAP_FACTOR)
+
+def schedule_stats_polls(candidatos: List[Tuple[Dict[str, Any], int, float, str]],
+                         now: Optional[float] = None) -> List[Tuple[Dict[str, Any], int, float, str]]:
+    """
+    Escolhe quais candidatos gastam stats neste tick: só os com poll vencido,
+    do mais urgente (janela fechando) para o menos, até STATS_MAX_PER_TICK.
+    Os escolhidos já ficam com o próximo poll agendado (desfeito no main_loop se as stats
+    não vierem: o jogo volta no próximo tick, ou ao fim do backoff).
+    """
+    now = time.time() if now is None else now
+    heap = []
+    for idx, cand in enumerate(candidatos):
+        fixture_id, minute = cand[1], cand[2]
+        if now < fixture_state(fixture_id).next_poll:
+            continue
+        heapq.heappush(heap, (minutes_to_window_close(minute) or 0.0, idx, cand))
+    limite = STATS_MAX_PER_TICK if STATS_MAX_PER_TICK > 0 else len(heap)
+    escolhidos = sorted(heapq.heappop(heap)[1:] for _ in range(min(limite, len(heap))))
+    for _, (_, fixture_id, minute, _) in escolhidos:
+        fixture_state(fixture_id).next_poll = now + poll_gap_seconds(minute)
+    return [cand for _, cand in escolhidos]  # mantém a ordem original de avaliação
+
 def smooth_minute(fixture_id: int, raw: float) -> float:
     """Garante minuto não regressivo e sem saltos >5 entre varreduras."""
     raw = float(raw or 0.0)
-    prev = last_elapsed_seen.get(fixture_id, 0.0)
+    state = fixture_state(fixture_id)
+    prev = state.last_elapsed
     if raw < prev:          # não retrocede
         raw = prev
     if raw - prev > 5.0:    # evita saltos muito grandes
         raw = prev + 5.0
     raw = max(0.0, min(95.0, raw))  # clamp
-    last_elapsed_seen[fixture_id] = raw
+    state.last_elapsed = raw
     return round(raw, 1)
 
 # ========================= MÉTRICAS STATUS ====================
@@ -738,64 +2367,272 @@ def atualizar_metricas(loop_total: int, req_headers: Dict[str, str]):
         LAST_API_STATUS = "⚠️ Cabeçalhos ausentes"
         LAST_RATE_USAGE = "Indefinido"
 
+    refresh_status_snapshot()
+
+# Snapshot para /status e /debug: montado pelo scanner uma vez por tick, só lido pelo webhook.
+STATUS_SNAPSHOT: Dict[str, Any] = {}
+
+def refresh_status_snapshot() -> None:
+    global STATUS_SNAPSHOT
+    if LAST_SCAN_TIME:
+        tz = pytz.timezone("America/Sao_Paulo")
+        last_scan_local = LAST_SCAN_TIME.astimezone(tz) if LAST_SCAN_TIME.tzinfo else tz.localize(LAST_SCAN_TIME)
+        last_scan_txt = last_scan_local.strftime("%H:%M:%S")
+    else:
+        last_scan_txt = "Ainda não realizada"
+    STATUS_SNAPSHOT = {
+        "gerado_em": time.time(),
+        "total_jogos": total,
+        "varreduras": TOTAL_VARRIDURAS,
+        "last_scan_txt": last_scan_txt,
+        "scan_dur": LAST_SCAN_DURATION,
+        "api_status": LAST_API_STATUS,
+        "uso_api": LAST_RATE_USAGE,
+        "cota": QUOTA_STAGE_NAMES.get(QUOTA_STAGE),
+        "registro": fixture_registry_stats(),
+        "filtro_ao_vivo": live_filter_summary(),
+        "request_count": request_count,
+        "agendador": quota_summary(),
+        "chaves": api_keys_summary(),
+        "conexoes": http_pool_summary(),
+        "cache_standings": enrich_cache_summary(),
+        "telegram": tg_outbox_summary(),
+        "assinantes": fanout_summary(),
+        "liquidacao": settle_summary(),
+        "etapas": trace_recente()[-1:],
+        "primeira_util": PRIMEIRA_VARREDURA_UTIL,
+        "restaurados": estado_restaurado,
+        "start_time": START_TIME,
+        "poupadas": scan_calls_saved,
+        "poupadas_total": scan_calls_saved_total,
+        "rate_headers": dict(last_rate_headers),
+    }
+
+    if PROCESS_ROLE == "scanner":
+        _publicar_snapshot()
+
+def _status_snapshot() -> Dict[str, Any]:
+    if PROCESS_ROLE == "web":
+        return _ler_snapshot_publicado()
+    if not STATUS_SNAPSHOT:
+        refresh_status_snapshot()  # antes da primeira varredura
+    return STATUS_SNAPSHOT
+
+def render_status_text() -> str:
+    snap = _status_snapshot()
+    uptime = int(time.time() - snap.get("start_time", START_TIME))
+    horas = uptime // 3600
+    minutos = (uptime % 3600) // 60
+    registro = snap["registro"]
+    return (
+        "📊 Status Bot Escanteios RP VIP Plus\n"
+        "━━━━━━━━━━━━━━━━━━━\n"
+        f"🕒 Tempo online: {horas}h {minutos}min\n"
+        f"⚽ Jogos varridos: {snap['total_jogos']}\n"
+        f"🔁 Varreduras realizadas: {snap['varreduras']}\n"
+        f"⏱️ Última varredura: {snap['last_scan_txt']} ({snap['scan_dur']:.1f}s)\n"
+        f"🌐 Status API: {snap['api_status']}\n"
+        f"📉 Uso da API: {snap['uso_api']}\n"
+        f"🚦 Cota: {snap['cota']}\n"
+        f"🗃 Jogos em memória: {registro['live']} ativos | {registro['evicted']} despejados | "
+        f"~{registro['approx_bytes'] / 1024:.0f} KB\n"
+        "━━━━━━━━━━━━━━━━━━━\n"
+        "🤖 Versão: Multi v2 Econômico ULTRA Sensível v3.2.2 (NASA)"
+    )
+
+def _etapas_txt(ticks: List[Dict[str, Any]]) -> str:
+    if not ticks:
+        return "—"
+    etapas = sorted(ticks[-1]["etapas"].items(), key=lambda kv: -kv[1])
+    return " | ".join(f"{nome} {seg:.2f}s" for nome, seg in etapas)
+
+def _fmt_primeira_util(seg: Optional[float]) -> str:
+    return "—" if seg is None else f"{seg:.1f}s"
+
+def render_debug_text() -> str:
+    snap = _status_snapshot()
+    return (
+        "🧩 Modo Debug\n"
+        f"📦 Requests enviados: {snap['request_count']}\n"
+        f"⏱ Intervalo base: {SCAN_INTERVAL_BASE}s (máx. {SCAN_INTERVAL_MAX}s)\n"
+        f"🚦 Agendador: {snap['agendador']}\n"
+        f"🔑 Chaves API: {snap['chaves']}\n"
+        f"🧵 Stats em paralelo: {STATS_MAX_INFLIGHT}\n"
+        f"♻️ Conexões reaproveitadas: {snap['conexoes']}\n"
+        f"🗂 Cache standings: {snap['cache_standings']}\n"
+        f"🧹 Filtro live: {snap['filtro_ao_vivo']}\n"
+        f"✉️ Telegram: {snap['telegram']}\n"
+        f"📬 Assinantes: {snap['assinantes']}\n"
+        f"🧾 Liquidação: {snap['liquidacao']}\n"
+        f"⏱ Etapas (último tick): {_etapas_txt(snap['etapas'])}\n"
+        f"♻️ Boot: 1ª varredura útil em {_fmt_primeira_util(snap['primeira_util'])} "
+        f"({'warm start, ' + str(snap['restaurados']) + ' jogos' if snap['restaurados'] else 'partida a frio'})\n"
+        f"🧠 Chamadas poupadas (dedupe): {snap['poupadas']} na última varredura, {snap['poupadas_total']} no total\n"
+        f"📡 Headers API: {snap['rate_headers']}"
+    )
+
 # ========================== RELATÓRIO DE PERFORMANCE ==========================
+# Sinais ficam num SQLite (WAL) indexado por data, fixture e estratégia. O antigo
+# relatorio.csv é importado uma única vez e renomeado para *.importado.
 RELATORIO_PATH = "relatorio.csv"
+SIGNALS_DB_PATH = os.getenv("SIGNALS_DB_PATH", "sinais.db")
+if BOT_MODE == "replay":  # o replay nunca escreve nos arquivos de produção
+    RELATORIO_PATH = os.path.join(REPLAY_DIR, "relatorio.csv")
+    SIGNALS_DB_PATH = os.path.join(REPLAY_DIR, "sinais.db")
+
+_signals_conn: Optional[sqlite3.Connection] = None
+_signals_lock = threading.Lock()
+
+_SIGNALS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sinais (
+    id          INTEGER PRIMARY KEY,
+    data        TEXT NOT NULL,
+    hora        TEXT NOT NULL,
+    fixture_id  INTEGER,
+    periodo     TEXT,
+    jogo        TEXT NOT NULL,
+    estrategias TEXT NOT NULL,
+    resultado   TEXT NOT NULL DEFAULT '⏳'
+);
+CREATE TABLE IF NOT EXISTS sinal_estrategias (
+    sinal_id   INTEGER NOT NULL REFERENCES sinais(id) ON DELETE CASCADE,
+    estrategia TEXT NOT NULL,
+    PRIMARY KEY (sinal_id, estrategia)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sinais_data ON sinais(data);
+CREATE INDEX IF NOT EXISTS idx_sinais_fixture ON sinais(fixture_id, periodo);
+CREATE INDEX IF NOT EXISTS idx_sinal_estrategias ON sinal_estrategias(estrategia);
+"""
 
-def registrar_sinal(fixture: dict, estrategias: list, resultado: str = "⏳") -> None:
-    teams = fixture.get("teams", {}) or {}
-    home_team = (teams.get("home", {}) or {}).get("name", "?")
-    away_team = (teams.get("away", {}) or {}).get("name", "?")
-    with open(RELATORIO_PATH, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            date.today().isoformat(),
-            datetime.now().strftime("%H:%M"),
-            f"{home_team} x {away_team}",
-            ",".join(estrategias) if estrategias else "Nenhuma",
-            resultado
-        ])
-
-def atualizar_resultado(jogo: str, resultado: str):
+def _signals_db() -> sqlite3.Connection:
+    global _signals_conn
+    if _signals_conn is not None:
+        return _signals_conn
+    with _signals_lock:
+        if _signals_conn is None:
+            os.makedirs(os.path.dirname(SIGNALS_DB_PATH) or ".", exist_ok=True)
+            conn = sqlite3.connect(SIGNALS_DB_PATH, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(_SIGNALS_SCHEMA)
+            _importar_relatorio_csv(conn)
+            _signals_conn = conn
+    return _signals_conn
+
+def _inserir_sinais(conn: sqlite3.Connection,
+                    linhas: List[Tuple[str, str, Optional[int], Optional[str], str, List[str], str]]) -> None:
+    """Insere (data, hora, fixture_id, periodo, jogo, estrategias, resultado) numa única transação."""
+    conn.execute("BEGIN")
+    try:
+        for data, hora, fixture_id, periodo, jogo, estrategias, resultado in linhas:
+            cur = conn.execute(
+                "INSERT INTO sinais (data, hora, fixture_id, periodo, jogo, estrategias, resultado) "
+                "VALUES (?,?,?,?,?,?,?)",
+                (data, hora, fixture_id, periodo, jogo, json.dumps(estrategias, ensure_ascii=False), resultado))
+            conn.executemany("INSERT OR IGNORE INTO sinal_estrategias (sinal_id, estrategia) VALUES (?,?)",
+                             [(cur.lastrowid, e) for e in estrategias])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _importar_relatorio_csv(conn: sqlite3.Connection) -> None:
+    """Importa o relatorio.csv legado (uma vez). O csv.reader respeita as aspas da coluna de estratégias."""
+    if not os.path.exists(RELATORIO_PATH):
+        return
     linhas = []
-    with open(RELATORIO_PATH, "r", encoding="utf-8") as f:
-        linhas = [linha.strip().split(",") for linha in f.readlines()]
-    for linha in linhas:
-        if jogo.lower() in linha[2].lower():
-            linha[-1] = resultado
-    with open(RELATORIO_PATH, "w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerows(linhas)
+    with open(RELATORIO_PATH, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 5:
+                continue
+            estrategias = [e.strip() for e in row[3].split(",") if e.strip() not in ("Nenhuma", "")]
+            linhas.append((row[0], row[1], None, None, row[2], estrategias, row[-1]))
+    _inserir_sinais(conn, linhas)
+    os.replace(RELATORIO_PATH, RELATORIO_PATH + ".importado")
+    logger.info("📥 %d sinais importados de %s para %s.", len(linhas), RELATORIO_PATH, SIGNALS_DB_PATH)
+
+def registrar_sinais(registros: List[Tuple[dict, list, str, Optional[str]]]) -> None:
+    """Registra vários sinais (fixture, estrategias, resultado, periodo) numa transação só."""
+    agora = datetime.now()
+    linhas = []
+    for fixture, estrategias, resultado, periodo in registros:
+        teams = fixture.get("teams", {}) or {}
+        home_team = (teams.get("home", {}) or {}).get("name", "?")
+        away_team = (teams.get("away", {}) or {}).get("name", "?")
+        linhas.append((date.today().isoformat(), agora.strftime("%H:%M"),
+                       (fixture.get("fixture", {}) or {}).get("id"), periodo,
+                       f"{home_team} x {away_team}", list(estrategias or []), resultado))
+    conn = _signals_db()
+    with _signals_lock:
+        _inserir_sinais(conn, linhas)
+
+def registrar_sinal(fixture: dict, estrategias: list, resultado: str = "⏳", periodo: Optional[str] = None) -> None:
+    registrar_sinais([(fixture, estrategias, resultado, periodo)])
+
+def atualizar_resultado_sinal(fixture_id: int, resultado: str, periodo: Optional[str] = None) -> int:
+    """Marca o resultado dos sinais pendentes do jogo (via índice fixture_id/periodo). Retorna linhas afetadas."""
+    conn = _signals_db()
+    with _signals_lock:
+        if periodo is None:
+            cur = conn.execute("UPDATE sinais SET resultado = ? WHERE fixture_id = ? AND resultado = '⏳'",
+                               (resultado, fixture_id))
+        else:
+            cur = conn.execute("UPDATE sinais SET resultado = ? WHERE fixture_id = ? AND periodo = ? "
+                               "AND resultado = '⏳'", (resultado, fixture_id, periodo))
+    return cur.rowcount
+
+def atualizar_resultados_sinais(resultados: List[Tuple[int, Optional[str], str]]) -> int:
+    """Versão em lote de atualizar_resultado_sinal: (fixture_id, periodo, resultado) numa transação só."""
+    if not resultados:
+        return 0
+    conn = _signals_db()
+    afetadas = 0
+    with _signals_lock:
+        conn.execute("BEGIN")
+        try:
+            for fixture_id, periodo, resultado in resultados:
+                if periodo is None:
+                    cur = conn.execute("UPDATE sinais SET resultado = ? WHERE fixture_id = ? AND resultado = '⏳'",
+                                       (resultado, fixture_id))
+                else:
+                    cur = conn.execute("UPDATE sinais SET resultado = ? WHERE fixture_id = ? AND periodo = ? "
+                                       "AND resultado = '⏳'", (resultado, fixture_id, periodo))
+                afetadas += cur.rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return afetadas
 
 def gerar_relatorio_diario():
-    try:
-        with open(RELATORIO_PATH, "r", encoding="utf-8") as f:
-            rows = [r.strip().split(",") for r in f.readlines()]
-    except FileNotFoundError:
+    if not os.path.exists(SIGNALS_DB_PATH) and not os.path.exists(RELATORIO_PATH):
         send_telegram_message("📊 Nenhum dado disponível ainda no relatório.")
         return
 
+    conn = _signals_db()
     hoje = date.today().isoformat()
-    registros = [r for r in rows if r and r[0] == hoje]
-    if not registros:
+    with _signals_lock:
+        total_rel, greens, reds, pendentes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(resultado LIKE '%✅%'), 0), COALESCE(SUM(resultado LIKE '%❌%'), 0), "
+            "COALESCE(SUM(resultado = '⏳'), 0) FROM sinais WHERE data = ?", (hoje,)).fetchone()
+        mais_frequente = conn.execute(
+            "SELECT e.estrategia, COUNT(*) AS n FROM sinais s JOIN sinal_estrategias e ON e.sinal_id = s.id "
+            "WHERE s.data = ? GROUP BY e.estrategia ORDER BY n DESC LIMIT 1", (hoje,)).fetchone()
+    if not total_rel:
         send_telegram_message("📊 Nenhum sinal registrado hoje ainda.")
         return
 
-    total_rel = len(registros)
-    greens = sum(1 for r in registros if "✅" in r[-1])
-    reds = sum(1 for r in registros if "❌" in r[-1])
-    pendentes = total_rel - greens - reds
-    eficiencia = (greens / total_rel * 100) if total_rel else 0
-
-    estrategias = [e for r in registros for e in r[3].split(",") if e.strip() not in ["Nenhuma", ""]]
-    mais_frequentes = Counter(estrategias).most_common(1)
-    melhor_estrategia = mais_frequentes[0][0] if mais_frequentes else "—"
+    decididos = greens + reds   # ANULADO e pendentes não entram no aproveitamento
+    eficiencia = (greens / decididos * 100) if decididos else 0
+    melhor_estrategia = mais_frequente[0] if mais_frequente else "—"
 
     msg = (
         f"📊 Relatório de Performance — Bot Escanteios RP VIP+\n"
         f"🗓️ Período: {datetime.now().strftime('%d/%m/%Y')}\n"
         f"📈 Total de Sinais: {total_rel}\n"
-        f"✅ Greens: {greens} ({(greens/total_rel*100):.0f}%)\n"
-        f"❌ Reds: {reds} ({(reds/total_rel*100):.0f}%)\n"
+        f"✅ Greens: {greens} ({eficiencia:.0f}%)\n"
+        f"❌ Reds: {reds} ({(reds / decididos * 100) if decididos else 0:.0f}%)\n"
         f"⏳ Pendentes: {pendentes}\n"
         f"⚙️ Eficiência Média: {eficiencia:.1f}%\n"
         f"💡 Melhor Estratégia: {melhor_estrategia}\n"
@@ -804,29 +2641,172 @@ def gerar_relatorio_diario():
     )
     send_telegram_message_plain(msg, parse_mode="HTML")
 
+# ===================== TRACE POR ETAPA / PROFILER =====================
+# Cada tick acumula o tempo de cada etapa (live, seleção, stats, parse, estratégias,
+# enriquecimento, mensagem, telegram, registro) e entra num ring buffer dos últimos
+# TRACE_TICKS ticks. O /profile N liga o cProfile na thread do scanner pelos próximos N ticks.
+_trace_ring: "deque[Dict[str, Any]]" = deque(maxlen=TRACE_TICKS)
+_trace_atual: Dict[str, float] = {}
+_trace_inicio = 0.0
+_trace_lock = threading.Lock()
+_profile_restantes = 0
+_profile_ativo: Optional[cProfile.Profile] = None
+ultimo_profile: Optional[str] = None
+
+class span:
+    """`with span("etapa"):` soma o tempo do bloco na etapa do tick atual."""
+    __slots__ = ("nome", "t0")
+
+    def __init__(self, nome: str) -> None:
+        self.nome = nome
+
+    def __enter__(self) -> "span":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        trace_etapa(self.nome, self.t0)
+
+def trace_etapa(nome: str, desde: float) -> float:
+    """Soma perf_counter() - desde na etapa e devolve o instante atual (para encadear marcas)."""
+    agora = time.perf_counter()
+    _trace_atual[nome] = _trace_atual.get(nome, 0.0) + (agora - desde)
+    return agora
+
+def begin_tick_trace() -> None:
+    global _trace_atual, _trace_inicio
+    _trace_atual = {}
+    _trace_inicio = time.perf_counter()
+    _profile_tick_begin()
+
+def end_tick_trace(jogos: int) -> None:
+    _profile_tick_end()
+    etapas = _trace_atual
+    registro = {"fim": datetime.now().strftime("%H:%M:%S"), "jogos": jogos,
+                "total_s": time.perf_counter() - _trace_inicio, "etapas": dict(etapas)}
+    with _trace_lock:
+        _trace_ring.append(registro)
+    for nome, seg in etapas.items():
+        METRIC_STAGE_SECONDS.observe(seg, nome)
+
+def trace_recente() -> List[Dict[str, Any]]:
+    with _trace_lock:
+        return list(_trace_ring)
+
+def render_trace_text() -> str:
+    ticks = trace_recente()
+    if not ticks:
+        return "⏱ Nenhuma varredura registrada ainda."
+    ultimo = ticks[-1]
+    nomes = sorted({n for t in ticks for n in t["etapas"]}, key=lambda n: -ultimo["etapas"].get(n, 0.0))
+    linhas = [f"⏱ <b>Última varredura</b> ({ultimo['fim']}, {ultimo['jogos']} jogos): {ultimo['total_s']:.2f}s"]
+    for nome in nomes:
+        valores = [t["etapas"].get(nome, 0.0) for t in ticks]
+        linhas.append(f"• {_html(nome)}: {ultimo['etapas'].get(nome, 0.0):.3f}s "
+                      f"(média {sum(valores) / len(valores):.3f}s, máx. {max(valores):.3f}s em {len(ticks)} ticks)")
+    if ultimo_profile:
+        linhas.append(f"🔬 Último profile: {_html(os.path.basename(ultimo_profile))}")
+    return "\n".join(linhas)
+
+def agendar_profile(ticks: int) -> None:
+    global _profile_restantes
+    _profile_restantes = max(1, min(int(ticks), 100))
+
+def _profile_tick_begin() -> None:
+    global _profile_ativo
+    if _profile_restantes > 0 and _profile_ativo is None:
+        _profile_ativo = cProfile.Profile()
+    if _profile_ativo is not None:
+        _profile_ativo.enable()
+
+def _profile_tick_end() -> None:
+    global _profile_ativo, _profile_restantes, ultimo_profile
+    if _profile_ativo is None:
+        return
+    _profile_ativo.disable()
+    _profile_restantes -= 1
+    if _profile_restantes > 0:
+        return
+    prof, _profile_ativo = _profile_ativo, None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    ultimo_profile = os.path.join(PROFILE_DIR, f"scan-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof")
+    prof.dump_stats(ultimo_profile)
+    resumo = io.StringIO()
+    pstats.Stats(prof, stream=resumo).sort_stats("cumulative").print_stats(12)
+    logger.info("🔬 Profile salvo em %s\n%s", ultimo_profile, resumo.getvalue())
+    send_admin_message(f"🔬 Profile pronto: <code>{_html(os.path.basename(ultimo_profile))}</code> "
+                       f"(GET /admin/profile/{_html(os.path.basename(ultimo_profile))})")
+
+def _admin_http_ok() -> bool:
+    token = request.headers.get("X-Admin-Token") or request.args.get("token")
+    return bool(ADMIN_TOKEN) and token == ADMIN_TOKEN
+
+@app.route('/admin/trace', methods=['GET'])
+def admin_trace():
+    if not _admin_http_ok():
+        abort(404)
+    return jsonify(_status_snapshot().get("trace", []) if PROCESS_ROLE == "web" else trace_recente()), 200
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    if not _admin_http_ok():
+        abort(404)
+    ticks = request.args.get("ticks", "3")
+    ticks = int(ticks) if ticks.isdigit() else 3
+    if PROCESS_ROLE == "web":
+        _encaminhar_ao_scanner({"tipo": "profile", "ticks": ticks})
+    else:
+        agendar_profile(ticks)
+    return jsonify({"ok": True, "ticks": ticks}), 200
+
+@app.route('/admin/profile/<nome>', methods=['GET'])
+def admin_profile_download(nome: str):
+    if not _admin_http_ok() or not nome.endswith(".prof"):
+        abort(404)
+    return send_from_directory(os.path.abspath(PROFILE_DIR), nome, as_attachment=True)
+
 # ========================= MAIN LOOP ==========================
+def dormir(segundos: float) -> bool:
+    """Espera interrompível pelo SIGTERM (respeita o relógio acelerado do replay). True = parar."""
+    fator = REPLAY_SPEED if isinstance(time, _TempoComprimido) else 1.0
+    return _parar.wait(max(0.0, segundos) / fator)
+
 def main_loop():
     logger.info("🔁 Loop econômico iniciado. Base: %ss (renotify=%s min).", SCAN_INTERVAL_BASE, RENOTIFY_MINUTES)
     logger.info("🟢 Loop econômico ativo: aguardando jogos ao vivo...")
 
-    global total
+    global total, LAST_SCAN_DURATION, PRIMEIRA_VARREDURA_UTIL, _scanner_iniciado
     signals_sent = 0
+    carregar_estado()
+    _scanner_iniciado = True
 
-    while True:
+    while not _parar.is_set():
         try:
+            scan_started = time.monotonic()
+            begin_scan_context()
+            begin_tick_trace()
+            marca = time.perf_counter()
             fixtures = get_live_fixtures()
             total = len(fixtures)
+            marca = trace_etapa("live_fixtures", marca)
 
             if total == 0:
                 logger.debug("Sem partidas ao vivo no momento. (req=%s, rate=%s)", request_count, last_rate_headers)
-                time.sleep(SCAN_INTERVAL_BASE)
+                LAST_SCAN_DURATION = time.monotonic() - scan_started
+                end_tick_trace(0)
+                end_scan_context()
+                dormir(plan_scan_interval())
                 atualizar_metricas(0, last_rate_headers)
                 continue
 
-            scan_interval = SCAN_INTERVAL_BASE if total < 20 else SCAN_INTERVAL_BASE + 60
-            logger.debug("🎯 %d jogos ao vivo | intervalo=%ds | req=%s | rate=%s",
-                         total, scan_interval, request_count, last_rate_headers)
+            despejados = prune_fixture_states(fixtures)
+            if despejados:
+                logger.debug("🧹 %d jogos encerrados/fora do live=all removidos do registro.", despejados)
+            logger.debug("🎯 %d jogos ao vivo | cota=%s | req=%s | rate=%s",
+                         total, QUOTA_STAGE_NAMES.get(QUOTA_STAGE), request_count, last_rate_headers)
 
+            # 1) Seleção: só jogos válidos, dentro de uma janela e ainda não sinalizados no período
+            candidatos: List[Tuple[Dict[str, Any], int, float, str]] = []
             for fixture in fixtures:
                 fixture_id = fixture.get('fixture', {}).get('id')
                 if not fixture_id:
@@ -855,35 +2835,55 @@ def main_loop():
 
                 period = period_by_window  # 'HT' ou 'FT' pela janela (não pelo minuto simples)
 
-                if period in sent_period[fixture_id]:
+                if period in fixture_state(fixture_id).sent_period:
                     logger.debug(f"🔒 Já sinalizado neste período {period} (fixture={fixture_id}). Pulando.")
                     continue
 
-                stats_resp = get_fixture_statistics(fixture_id)
+                candidatos.append((fixture, fixture_id, minute, period))
+
+            marca = trace_etapa("selecao", marca)
+
+            # 2) Prioridade: janela fechando primeiro; quem acabou de entrar espera alguns ticks
+            na_janela = len(candidatos)
+            candidatos = schedule_stats_polls(candidatos)
+
+            # 3) Stats dos escolhidos: em lotes de 20 (fixtures?ids=) ou por jogo em paralelo
+            fetch_started = time.monotonic()
+            if STATS_BATCH:
+                stats_by_fixture = fetch_statistics_batched([c[1] for c in candidatos])
+            else:
+                stats_by_fixture = fetch_statistics_concurrently([c[1] for c in candidatos])
+            fetch_elapsed = time.monotonic() - fetch_started
+            marca = trace_etapa("stats_fetch", marca)
+
+            # 4) Métricas de quem tem stats; pontuação escalar ou em lote (NumPy) conforme o tamanho
+            avaliaveis = []
+            for fixture, fixture_id, minute, period in candidatos:
+                stats_resp = stats_by_fixture.get(fixture_id)
                 if not stats_resp:
                     logger.debug(f"Sem estatísticas para fixture={fixture_id} no momento.")
+                    st = fixture_state(fixture_id)
+                    st.next_poll = st.backoff_until   # poll não aconteceu: não espera o espaçamento
                     continue
-
                 home, away = extract_basic_stats(fixture, stats_resp)
-                press_home, press_away = pressure_score_vip(home, away)
-
-                total_corners = (home['corners'] or 0) + (away['corners'] or 0)
-                total_shots = (home['shots'] or 0) + (away['shots'] or 0)
-
-                metrics = {
-                    'minute': minute,
-                    'home_corners': home['corners'], 'away_corners': away['corners'],
-                    'home_attacks': home['attacks'], 'away_attacks': away['attacks'],
-                    'home_danger': home['danger'], 'away_danger': away['danger'],
-                    'home_shots': home['shots'], 'away_shots': away['shots'],
-                    'home_pos': home['pos'], 'away_pos': away['pos'],
-                    'press_home': press_home, 'press_away': press_away,
-                    'small_stadium': (fixture.get('fixture', {}).get('venue', {}).get('name', '').lower() in SMALL_STADIUMS),
-                    'total_corners': total_corners,
-                    'total_shots': total_shots
-                }
-
-                estrategias, composite_ok = verificar_estrategias_vip(fixture, metrics)
+                if ((fixture.get("fixture") or {}).get("status") or {}).get("short") == "HT":
+                    fixture_state(fixture_id).cantos_ht = home["corners"] + away["corners"]
+                metrics = montar_metricas_vip(fixture, minute, home, away)
+                metrics.update(atualizar_serie(fixture_id, minute, home, away))
+                avaliaveis.append((fixture, fixture_id, minute, period, metrics))
+
+            marca = trace_etapa("parse", marca)
+
+            if BATCH_SCORING_MIN and len(avaliaveis) >= BATCH_SCORING_MIN:
+                resultados = avaliar_lote_vip([a[0] for a in avaliaveis], [a[4] for a in avaliaveis])
+            else:
+                resultados = [verificar_estrategias_vip(a[0], a[4]) for a in avaliaveis]
+            trace_etapa("estrategias", marca)
+
+            # 5) Envio (sequencial, na ordem original dos jogos)
+            for (fixture, fixture_id, minute, period, metrics), (estrategias, composite_ok) in zip(avaliaveis, resultados):
+                press_home, press_away = metrics['press_home'], metrics['press_away']
+                total_corners = metrics['total_corners']
                 if not estrategias and not composite_ok:
                     logger.debug(f"IGNORADO fixture={fixture_id} minuto={minute:.1f} | press(H)={press_home:.2f}/A={press_away:.2f}")
                     continue
@@ -894,44 +2894,213 @@ def main_loop():
                 # 💬 Envio do Sinal
                 if (len(estrategias) >= limite_estrategias or composite_ok) and should_notify(fixture_id, signal_key):
                     try:
-                        msg = build_signal_message_vip(fixture, estrategias, metrics)
-                        send_telegram_message_plain(msg, parse_mode="HTML")
-                        registrar_sinal(fixture, estrategias, "⏳")
-                        signals_sent += 1
-                        sent_period[fixture_id].add(period)
-                        logger.info(f"📤 Sinal enviado ({period}): {len(estrategias)} estratégias fixture={fixture_id} min={minute:.1f}")
+                        entregas = enviar_sinal(fixture, estrategias, metrics, period)
                     except Exception as e:
                         logger.error(f"❌ Erro ao enviar sinal: {e}")
+                        continue
+                    # já enfileirado: marca o período antes de persistir, para não reenviar se a escrita falhar
+                    fixture_state(fixture_id).sent_period.add(period)
+                    if not entregas:   # nenhum assinante aceitou: não conta, não registra, não liquida
+                        continue
+                    signals_sent += 1
+                    for estrategia in (estrategias or ["Composite"]):
+                        METRIC_SIGNALS.inc(estrategia, period)
+                    logger.info(f"📤 Sinal enviado ({period}): {len(estrategias)} estratégias fixture={fixture_id} min={minute:.1f}")
+                    with span("registro"):
+                        try:
+                            registrar_sinal(fixture, estrategias, "⏳", periodo=period)
+                        except Exception as e:
+                            logger.error(f"❌ Erro ao registrar sinal no SQLite (fixture={fixture_id}): {e}")
+                        try:
+                            # linha = cantos no momento + 0.5: GREEN se sair mais um canto no período
+                            teams = fixture.get("teams", {}) or {}
+                            salvar_sinal(fixture_id,
+                                         f"{(teams.get('home') or {}).get('name', '?')} x {(teams.get('away') or {}).get('name', '?')}",
+                                         "Asiáticos/Limite", period, total_corners, total_corners + 0.5)
+                        except Exception as e:
+                            logger.error(f"❌ Erro ao salvar sinal no histórico (fixture={fixture_id}): {e}")
                 else:
                     logger.debug(f"❌ Estratégias insuficientes ({len(estrategias)}). Aguardando próximo tick...")
 
+            scan_interval = SCAN_INTERVAL_BASE
             try:
-                logger.info(f"📊 Resumo: {total} jogos analisados | {signals_sent} sinais enviados | próxima em {scan_interval}s")
+                LAST_SCAN_DURATION = time.monotonic() - scan_started
+                METRIC_SCAN_DURATION.observe(LAST_SCAN_DURATION)
+                METRIC_SCAN_FIXTURES.set(live_filter_stats["recebidos"], "recebidos")
+                METRIC_SCAN_FIXTURES.set(total, "ao_vivo")
+                METRIC_SCAN_FIXTURES.set(na_janela, "na_janela")
+                METRIC_SCAN_FIXTURES.set(len(candidatos), "consultados")
+                METRIC_SCAN_FIXTURES.set(len(avaliaveis), "com_stats")
+                end_tick_trace(total)
+                if PRIMEIRA_VARREDURA_UTIL is None and avaliaveis:   # útil = algum jogo na janela pontuado
+                    PRIMEIRA_VARREDURA_UTIL = time.monotonic() - BOOT_MONOTONIC
+                    logger.info("⏱ 1ª varredura útil %.1fs após o boot (%s, %d avaliados, %d consultados de %d na janela).",
+                                PRIMEIRA_VARREDURA_UTIL,
+                                f"warm start com {estado_restaurado} jogos" if estado_restaurado else "partida a frio",
+                                len(avaliaveis), len(candidatos), na_janela)
+                scan_interval = plan_scan_interval()
+                logger.info(f"📊 Resumo: {total} jogos analisados | {na_janela} na janela "
+                            f"({len(candidatos)} consultados, {na_janela - len(candidatos)} adiados) | "
+                            f"{signals_sent} sinais enviados | varredura {LAST_SCAN_DURATION:.1f}s "
+                            f"(stats {fetch_elapsed:.1f}s, {'lotes de ' + str(FIXTURES_IDS_MAX) if STATS_BATCH else str(STATS_MAX_INFLIGHT) + ' em paralelo'}) | "
+                            f"{scan_calls_saved} chamadas poupadas | cota {QUOTA_STAGE_NAMES.get(QUOTA_STAGE)} | "
+                            f"próxima em {scan_interval}s")
                 atualizar_metricas(total, last_rate_headers)
+                salvar_estado_se_preciso()
                 signals_sent = 0
             except Exception as e:
                 logger.exception(f"Erro ao finalizar resumo da varredura: {e}")
 
-            time.sleep(scan_interval)
+            end_scan_context()
+            dormir(scan_interval)
 
         except Exception as e:
             logger.exception(f"Erro no loop principal: {e}")
-            time.sleep(SCAN_INTERVAL_BASE)
+            if _profile_ativo is not None:
+                _profile_ativo.disable()
+            end_scan_context()
+            dormir(SCAN_INTERVAL_BASE)
+    logger.info("⏹ Scanner parado (SIGTERM).")
 # ============================================================
 # ✅ MÓDULO VIP NASA – HISTÓRICO E RELATÓRIO DE SINAIS v1.0
 # ============================================================
 
-import json
-from datetime import datetime, timedelta
+HIST_FILE = "historico_sinais.json"          # formato antigo (migrado uma vez para HIST_DIR)
+HIST_DIR = os.getenv("HIST_DIR", "historico_sinais")
+if BOT_MODE == "replay":
+    HIST_FILE = os.path.join(REPLAY_DIR, "historico_sinais.json")
+    HIST_DIR = os.path.join(REPLAY_DIR, "historico_sinais")
+HIST_INDEX_DAYS = int(os.getenv("HIST_INDEX_DAYS", "3"))            # dias lidos no boot p/ achar PENDENTEs
+HIST_COMPACT_INTERVAL = int(os.getenv("HIST_COMPACT_INTERVAL", "3600"))
+
+# Log append-only por dia (HIST_DIR/AAAA-MM-DD.jsonl). Cada linha é um evento:
+#   {"op": "sinal", "uid": ..., <registro>}            -> sinal emitido (status PENDENTE)
+#   {"op": "status", "uid": ..., "status": ..., ...}   -> resultado, anexado na partição do sinal
+# A compactação (em background) funde os eventos de status nos sinais e troca o arquivo
+# por rename atômico. O índice em memória aponta os PENDENTEs por match_id.
+_hist_lock = threading.Lock()
+_hist_pendentes: Dict[Any, List[Tuple[str, str, float, Any]]] = {}   # match_id -> [(dia, uid, linha, periodo)]
+_hist_sujos: set = set()                                         # dias com eventos de status a compactar
+_hist_pronto = False
+_hist_compactador: Optional[threading.Thread] = None
+
+def _hist_path(dia: str) -> str:
+    return os.path.join(HIST_DIR, f"{dia}.jsonl")
+
+def _hist_append(dia: str, evento: Dict[str, Any]) -> None:
+    with open(_hist_path(dia), "a", encoding="utf-8") as f:
+        f.write(json.dumps(evento, ensure_ascii=False) + "\n")
+
+def _hist_ler_eventos(dia: str) -> List[Dict[str, Any]]:
+    eventos = []
+    try:
+        with open(_hist_path(dia), "r", encoding="utf-8") as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    eventos.append(json.loads(linha))
+                except ValueError:
+                    logger.warning("Linha corrompida ignorada em %s.", _hist_path(dia))  # ex.: queda no meio da escrita
+    except FileNotFoundError:
+        pass
+    return eventos
+
+def _hist_fold(eventos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aplica os eventos de status sobre os sinais, na ordem do log."""
+    sinais: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    for ev in eventos:
+        uid = ev.get("uid")
+        if ev.get("op") == "sinal":
+            sinais[uid] = {k: v for k, v in ev.items() if k != "op"}
+        elif ev.get("op") == "status" and uid in sinais:
+            sinais[uid].update({k: v for k, v in ev.items() if k not in ("op", "uid")})
+    return list(sinais.values())
+
+def _hist_migrar_json_antigo() -> None:
+    if not os.path.exists(HIST_FILE):
+        return
+    try:
+        with open(HIST_FILE, "r", encoding="utf-8") as f:
+            historico = json.load(f)
+    except Exception as e:
+        logger.warning("Não foi possível migrar %s: %s", HIST_FILE, e)
+        return
+    for dia, lista in historico.items():
+        with open(_hist_path(dia), "a", encoding="utf-8") as f:
+            for i, item in enumerate(lista):
+                f.write(json.dumps({"op": "sinal", "uid": f"{dia}-legado-{i}", **item}, ensure_ascii=False) + "\n")
+    os.replace(HIST_FILE, HIST_FILE + ".migrado")
+    logger.info("📥 %s migrado para %s/ (uma partição por dia).", HIST_FILE, HIST_DIR)
+
+def _hist_init() -> None:
+    """Cria o diretório, migra o JSON antigo e monta o índice de PENDENTEs dos últimos dias."""
+    global _hist_pronto
+    if _hist_pronto:
+        return
+    os.makedirs(HIST_DIR, exist_ok=True)
+    _hist_migrar_json_antigo()
+    hoje = datetime.now().date()
+    for n in range(HIST_INDEX_DAYS, -1, -1):
+        dia = (hoje - timedelta(days=n)).strftime("%Y-%m-%d")
+        eventos = _hist_ler_eventos(dia)
+        if any(ev.get("op") == "status" for ev in eventos):
+            _hist_sujos.add(dia)
+        for item in _hist_fold(eventos):
+            if item.get("status") == "PENDENTE":
+                _hist_pendentes.setdefault(item["id"], []).append(
+                    (dia, item["uid"], item.get("linha", 4.5), item.get("periodo")))
+    _hist_pronto = True
+
+def _hist_compactar_dia(dia: str) -> None:
+    """Reescreve a partição já com os status aplicados (tmp + fsync + rename atômico)."""
+    sinais = _hist_fold(_hist_ler_eventos(dia))
+    tmp = _hist_path(dia) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for item in sinais:
+            f.write(json.dumps({"op": "sinal", **item}, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _hist_path(dia))
+
+def compactar_historico() -> int:
+    """Compacta as partições com eventos de status pendentes de fusão. Retorna quantas."""
+    with _hist_lock:
+        _hist_init()
+        dias = sorted(_hist_sujos)
+        for dia in dias:
+            try:
+                _hist_compactar_dia(dia)
+                _hist_sujos.discard(dia)
+            except Exception as e:
+                logger.warning("Falha ao compactar %s: %s", _hist_path(dia), e)
+    return len(dias)
+
+def _hist_compactador_loop() -> None:
+    while True:
+        time.sleep(HIST_COMPACT_INTERVAL)
+        try:
+            n = compactar_historico()
+            if n:
+                logger.debug("🗜 Histórico: %d partições compactadas.", n)
+        except Exception as e:
+            logger.exception("Erro na compactação do histórico: %s", e)
 
-HIST_FILE = "historico_sinais.json"
+def _ensure_hist_compactador() -> None:
+    global _hist_compactador
+    if _hist_compactador is None:
+        _hist_compactador = threading.Thread(target=_hist_compactador_loop, name="hist-compact", daemon=True)
+        _hist_compactador.start()
 
 def salvar_sinal(match_id, jogo, tipo, periodo, cantos_atuais, linha_esperada):
     """
-    Salva o sinal emitido com status PENDENTE.
+    Salva o sinal emitido com status PENDENTE (uma linha anexada à partição do dia).
     """
     data = datetime.now().strftime("%Y-%m-%d")
     novo_registro = {
+        "op": "sinal",
+        "uid": f"{match_id}-{periodo}-{time.time_ns()}",
         "id": match_id,
         "jogo": jogo,
         "tipo": tipo,
@@ -941,56 +3110,100 @@ def salvar_sinal(match_id, jogo, tipo, periodo, cantos_atuais, linha_esperada):
         "status": "PENDENTE",
         "timestamp": datetime.now().strftime("%H:%M:%S")
     }
-    try:
-        historico = json.load(open(HIST_FILE, "r", encoding="utf-8"))
-    except:
-        historico = {}
-    if data not in historico:
-        historico[data] = []
-    historico[data].append(novo_registro)
-    json.dump(historico, open(HIST_FILE, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-    print(f"💾 Sinal salvo no histórico ({jogo})")
+    with _hist_lock:
+        _hist_init()
+        _hist_append(data, novo_registro)
+        _hist_pendentes.setdefault(match_id, []).append((data, novo_registro["uid"], linha_esperada, periodo))
+    _ensure_hist_compactador()
+    logger.info("💾 Sinal salvo no histórico (%s)", jogo)
+
+
+def atualizar_resultados(resultados):
+    """
+    Liquida vários sinais de uma vez: itens (match_id, periodo, total_cantos).
+    periodo None = primeiro PENDENTE do jogo; total_cantos None = ANULADO.
+    Os eventos de status são anexados agrupados por partição (um open por dia).
+    Retorna [(match_id, periodo, status)] dos sinais liquidados.
+    """
+    agora = datetime.now().strftime("%H:%M:%S")
+    por_dia: Dict[str, List[Dict[str, Any]]] = {}
+    liquidados = []
+    with _hist_lock:
+        _hist_init()
+        for match_id, periodo, total_cantos in resultados:
+            fila = _hist_pendentes.get(match_id) or []
+            idx = next((i for i, p in enumerate(fila) if periodo is None or p[3] == periodo), None)
+            if idx is None:
+                continue
+            dia, uid, linha, periodo_sinal = fila.pop(idx)
+            if not fila:
+                _hist_pendentes.pop(match_id, None)
+            if total_cantos is None:
+                status = "ANULADO"
+            else:
+                status = "GREEN" if total_cantos > linha else "RED"
+            por_dia.setdefault(dia, []).append({
+                "op": "status",
+                "uid": uid,
+                "status": status,
+                "cantos_finais": total_cantos,
+                "verificado_em": agora
+            })
+            liquidados.append((match_id, periodo_sinal, status))
+        for dia, eventos in por_dia.items():
+            with open(_hist_path(dia), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(ev, ensure_ascii=False) + "\n" for ev in eventos)
+            _hist_sujos.add(dia)
+    if liquidados:
+        _ensure_hist_compactador()
+    return liquidados
 
 
 def atualizar_resultado(match_id, total_cantos):
     """
     Atualiza o status do sinal para GREEN/RED com base no total de cantos.
     """
-    try:
-        historico = json.load(open(HIST_FILE, "r", encoding="utf-8"))
-    except:
-        return
+    liquidados = atualizar_resultados([(match_id, None, total_cantos)])
+    if not liquidados:
+        return False
+    print(f"✅ Resultado atualizado ({match_id}): {liquidados[0][2]}")
+    return True
 
-    atualizado = False
-    for data, lista in historico.items():
-        for item in lista:
-            if item["id"] == match_id and item["status"] == "PENDENTE":
-                linha = item.get("linha", 4.5)
-                if total_cantos > linha:
-                    item["status"] = "GREEN"
-                else:
-                    item["status"] = "RED"
-                item["cantos_finais"] = total_cantos
-                item["verificado_em"] = datetime.now().strftime("%H:%M:%S")
-                atualizado = True
-                break
-    if atualizado:
-        json.dump(historico, open(HIST_FILE, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-        print(f"✅ Resultado atualizado ({match_id}): {item['status']}")
-    return atualizado
+
+def _hist_emitido_em(dia: str, uid: str) -> float:
+    """Instante (epoch) do sinal: sufixo time_ns do uid; uids legados caem no início do dia."""
+    sufixo = str(uid).rsplit("-", 1)[-1]
+    if sufixo.isdigit() and len(sufixo) >= 18:
+        return int(sufixo) / 1e9
+    return datetime.strptime(dia, "%Y-%m-%d").timestamp()
+
+
+def sinais_vencidos(max_idade: float) -> List[Tuple[Any, Any]]:
+    """(match_id, periodo) dos PENDENTEs emitidos há mais de max_idade segundos."""
+    limite = time.time() - max_idade
+    with _hist_lock:
+        _hist_init()
+        return [(mid, p[3]) for mid, fila in _hist_pendentes.items() for p in fila
+                if _hist_emitido_em(p[0], p[1]) < limite]
+
+
+def sinais_pendentes() -> Dict[Any, List[Any]]:
+    """match_id -> períodos com sinal PENDENTE (cópia do índice em memória)."""
+    with _hist_lock:
+        _hist_init()
+        return {mid: [p[3] for p in fila] for mid, fila in _hist_pendentes.items() if fila}
 
 
 def gerar_relatorio():
     """
-    Gera o relatório diário de performance.
+    Gera o relatório diário de performance (lê só a partição de hoje).
     """
-    try:
-        historico = json.load(open(HIST_FILE, "r", encoding="utf-8"))
-    except:
-        return "📊 Nenhum dado no histórico ainda."
-
     hoje = datetime.now().strftime("%Y-%m-%d")
-    sinais = historico.get(hoje, [])
+    with _hist_lock:
+        _hist_init()
+        if not os.path.exists(_hist_path(hoje)) and not any(f.endswith(".jsonl") for f in os.listdir(HIST_DIR)):
+            return "📊 Nenhum dado no histórico ainda."
+        sinais = _hist_fold(_hist_ler_eventos(hoje))
     if not sinais:
         return "📊 Nenhum sinal registrado hoje."
 
@@ -998,7 +3211,7 @@ def gerar_relatorio():
     reds = sum(1 for s in sinais if s["status"] == "RED")
     pendentes = sum(1 for s in sinais if s["status"] == "PENDENTE")
     total = len(sinais)
-    perc = (greens / total * 100) if total else 0
+    perc = (greens / (greens + reds) * 100) if greens + reds else 0   # ANULADO fora do denominador
 
     resumo = (
         f"📊 <b>Relatório VIP NASA - {hoje}</b>\n"
@@ -1018,6 +3231,110 @@ def gerar_relatorio():
     return resumo
 
 
+# ============================================================
+# ✅ LIQUIDAÇÃO AUTOMÁTICA DOS SINAIS PENDENTES
+# ============================================================
+# Só pergunta à API pelos jogos que já podem ter resultado (no intervalo, para sinais HT,
+# ou fora do live=all, para FT) e em lotes de /fixtures?ids= (até 20 por chamada, com
+# statistics embutidas). Sinal HT de jogo já no 2º tempo liquida sem chamada se o registro
+# guardou os cantos do intervalo. Com a cota apertada só o intervalo é consultado (a
+# contagem do 1º tempo some depois dele); FT espera a cota voltar. Resultados vão em lote
+# para o histórico JSONL e para o SQLite.
+STATUS_ANULADOS = {"PST", "CANC", "ABD", "AWD", "WO"}
+STATUS_FINAL_FT = {"FT", "AET", "PEN"}
+RESULTADO_SQL = {"GREEN": "✅ GREEN", "RED": "❌ RED", "ANULADO": "➖ ANULADO"}
+
+settle_stats = {"rodadas": 0, "chamadas": 0, "liquidados": 0, "vencidos": 0}
+_settle_thread: Optional[threading.Thread] = None
+
+def _pronto_para_liquidar(fixture_id: int, periodos: List[Any]) -> bool:
+    st = _fixture_states.get(fixture_id)
+    if st is None:                     # terminou, sumiu do live=all ou o bot reiniciou
+        return True
+    if st.last_status in FINISHED_STATUSES:
+        return True
+    return "HT" in periodos and st.last_status not in ("", "1H")
+
+def _liquidacao_do_jogo(fx: Dict[str, Any], periodos: List[Any]) -> List[Tuple[Any, Optional[int]]]:
+    """(periodo, total_cantos) liquidáveis agora; total None = ANULADO."""
+    status = ((fx.get("fixture") or {}).get("status") or {}).get("short") or ""
+    home, away = extract_basic_stats(fx, fx.get("statistics") or [])
+    tem_stats = bool(fx.get("statistics"))
+    total_cantos = home["corners"] + away["corners"]
+    st = _fixture_states.get((fx.get("fixture") or {}).get("id"))
+    cantos_ht = st.cantos_ht if st is not None else None
+    saida = []
+    for periodo in periodos:
+        if status in STATUS_ANULADOS:
+            saida.append((periodo, None))
+        elif periodo == "HT":
+            if status == "HT" and tem_stats:
+                saida.append((periodo, total_cantos))
+            elif status not in ("", "NS", "1H", "HT"):
+                saida.append((periodo, cantos_ht))   # sem placar do intervalo guardado: ANULADO
+        elif status in STATUS_FINAL_FT and tem_stats:
+            saida.append((periodo, total_cantos))
+    return saida
+
+def liquidar_sinais_pendentes() -> int:
+    """Uma rodada de liquidação. Retorna quantos sinais foram liquidados."""
+    vencidos = atualizar_resultados([(fid, periodo, None) for fid, periodo in sinais_vencidos(SETTLE_MAX_AGE)])
+    if vencidos:
+        # a API nunca devolveu o jogo (ou devolveu sem cantos): encerra como ANULADO em vez de consultar para sempre
+        atualizar_resultados_sinais([(fid, periodo, RESULTADO_SQL[status]) for fid, periodo, status in vencidos])
+        settle_stats["vencidos"] += len(vencidos)
+        logger.info("🧾 %d sinais pendentes há mais de %.0fh encerrados como ANULADO.",
+                    len(vencidos), SETTLE_MAX_AGE / 3600)
+    pendentes = sinais_pendentes()
+    settle_stats["rodadas"] += 1
+
+    resultados = []
+    for fid, periodos in pendentes.items():
+        st = _fixture_states.get(fid)
+        if "HT" in periodos and st is not None and st.cantos_ht is not None and st.last_status not in ("", "NS", "1H", "HT"):
+            resultados.extend((fid, "HT", st.cantos_ht) for p in periodos if p == "HT")
+            pendentes[fid] = [p for p in periodos if p != "HT"]
+    prontos = sorted(fid for fid, periodos in pendentes.items() if periodos and _pronto_para_liquidar(fid, periodos))
+    if quota_skip_enrichment():
+        prontos = [fid for fid in prontos if "HT" in pendentes[fid]
+                   and getattr(_fixture_states.get(fid), "last_status", "") == "HT"]
+
+    for i in range(0, len(prontos), FIXTURES_IDS_MAX):
+        lote = prontos[i:i + FIXTURES_IDS_MAX]
+        data = safe_request(f"{API_BASE}/fixtures", headers=HEADERS, params={"ids": "-".join(map(str, lote))})
+        settle_stats["chamadas"] += 1
+        for fx in (data or {}).get("response", []):
+            fid = (fx.get("fixture") or {}).get("id")
+            for periodo, total_cantos in _liquidacao_do_jogo(fx, pendentes.get(fid, [])):
+                resultados.append((fid, periodo, total_cantos))
+
+    liquidados = atualizar_resultados(resultados)
+    if liquidados:
+        atualizar_resultados_sinais([(fid, periodo, RESULTADO_SQL[status]) for fid, periodo, status in liquidados])
+        settle_stats["liquidados"] += len(liquidados)
+        logger.info("🧾 %d sinais liquidados (%d jogos consultados em %d chamadas).",
+                    len(liquidados), len(prontos), -(-len(prontos) // FIXTURES_IDS_MAX))
+    return len(liquidados)
+
+def settle_summary() -> str:
+    return (f"{settle_stats['liquidados']} liquidados em {settle_stats['chamadas']} chamadas "
+            f"({settle_stats['rodadas']} rodadas) | {settle_stats['vencidos']} vencidos")
+
+def _settle_loop() -> None:
+    fora_da_varredura("liquidacao")
+    while True:
+        time.sleep(SETTLE_INTERVAL)
+        try:
+            liquidar_sinais_pendentes()
+        except Exception as e:
+            logger.exception("Erro na liquidação automática: %s", e)
+
+def start_settlement_worker() -> None:
+    global _settle_thread
+    if SETTLE_INTERVAL > 0 and _settle_thread is None:
+        _settle_thread = threading.Thread(target=_settle_loop, name="settle", daemon=True)
+        _settle_thread.start()
+
 # ============================================================
 # 🔹 EXEMPLO DE USO NO SEU BOT
 # ============================================================
@@ -1025,7 +3342,7 @@ def gerar_relatorio():
 # 1️⃣ Após enviar o sinal:
 # salvar_sinal(match_id, f"{home} x {away}", "Asiáticos/Limite", periodo, cantos_totais, 4.5)
 
-# 2️⃣ Quando quiser atualizar resultado manualmente:
+# 2️⃣ Resultado: liquidado automaticamente (start_settlement_worker); manual ainda funciona:
 # atualizar_resultado(match_id, total_cantos)
 
 # 3️⃣ No handler do comando /relatorio:
@@ -1033,8 +3350,149 @@ def gerar_relatorio():
 #     relatorio = gerar_relatorio()
 #     send_message(chat_id, relatorio, parse_mode="HTML")
 
+# =========================== REPLAY ============================
+def rodar_replay() -> None:
+    """Roda o pipeline inteiro sobre REPLAY_FILE (sem rede) até a gravação acabar."""
+    replay = _replay_api()
+    inicio_real = datetime.now()
+    threading.Thread(target=main_loop, name="scanner", daemon=True).start()
+    start_settlement_worker()
+    while not replay.terminou:
+        time.sleep(SCAN_INTERVAL_BASE)
+    logger.info("⏹ Replay concluído: %.0fs gravados em %.1fs reais | %d varreduras | %d respostas servidas "
+                "(%d sem gravação) | última varredura %.2fs | Telegram: %s",
+                replay.duracao, (datetime.now() - inicio_real).total_seconds(), TOTAL_VARRIDURAS, replay.servidas,
+                replay.sem_gravacao, LAST_SCAN_DURATION, tg_outbox_summary())
+
+# =========================== PROCESSOS ============================
+# PROCESS_MODE=split: o processo web (webhook, /health, /metrics, comandos de leitura) não
+# divide o GIL com a varredura. O scanner publica o snapshot de status (com o texto do
+# /metrics e o ring de trace) em STATUS_SNAPSHOT_PATH a cada tick, por rename atômico; o
+# web só lê (cache por mtime). Comandos que precisam do estado vivo do scanner vão por uma
+# multiprocessing.Queue.
+COMANDOS_DO_SCANNER = {"/trace", "/profile"}
+_fila_scanner = None            # multiprocessing.Queue (só no processo web)
+_snapshot_cache: Tuple[float, Dict[str, Any]] = (0.0, {})
+
+def _publicar_snapshot() -> None:
+    dados = dict(STATUS_SNAPSHOT, metrics_txt=render_metrics(), trace=trace_recente())
+    tmp = STATUS_SNAPSHOT_PATH + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, default=str)
+        os.replace(tmp, STATUS_SNAPSHOT_PATH)
+    except Exception as e:
+        logger.warning("Falha ao publicar snapshot de status: %s", e)
+
+def _ler_snapshot_publicado() -> Dict[str, Any]:
+    global _snapshot_cache
+    try:
+        mtime = os.stat(STATUS_SNAPSHOT_PATH).st_mtime
+    except OSError:
+        mtime = 0.0
+    if mtime and mtime != _snapshot_cache[0]:
+        try:
+            with open(STATUS_SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+                _snapshot_cache = (mtime, json.load(f))
+        except (OSError, ValueError):
+            pass  # escrita concorrente improvável (rename atômico); fica o anterior
+    if not _snapshot_cache[1]:
+        refresh_status_snapshot()  # scanner ainda não publicou: snapshot local (vazio)
+        return STATUS_SNAPSHOT
+    return _snapshot_cache[1]
+
+def _encaminhar_ao_scanner(msg: Dict[str, Any]) -> None:
+    try:
+        _fila_scanner.put_nowait(msg)
+    except Exception as e:
+        logger.warning("⚠️ Não foi possível encaminhar %s ao scanner: %s", msg.get("tipo"), e)
+
+def _drenar_telegram(limite_s: float = 10.0) -> None:
+    fim = time.monotonic() + limite_s
+    while _tg_outbox.unfinished_tasks and time.monotonic() < fim:
+        time.sleep(0.1)
+
+def _ao_sigterm(signum, frame) -> None:
+    logger.info("🛑 Sinal %s recebido: encerrando após o tick atual.", signum)
+    _parar.set()
+
+def instalar_sigterm_processo_unico(scanner: threading.Thread) -> None:
+    """PROCESS_MODE=single: SIGTERM fecha o tick atual, drena o Telegram e sai (o atexit grava o snapshot)."""
+    def _encerrar(signum, frame) -> None:
+        _ao_sigterm(signum, frame)
+        scanner.join(timeout=SCAN_INTERVAL_MAX)
+        _drenar_telegram()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, _encerrar)
+
+def rodar_processo_scanner(fila) -> None:
+    """Alvo do processo scanner (multiprocessing spawn)."""
+    global PROCESS_ROLE
+    PROCESS_ROLE = "scanner"
+    signal.signal(signal.SIGTERM, _ao_sigterm)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl+C chega ao grupo: quem coordena é o web
+
+    def _consumir_fila() -> None:
+        while True:
+            msg = fila.get()
+            if msg.get("tipo") == "profile":
+                agendar_profile(int(msg.get("ticks", 3)))
+                send_admin_message(f"🔬 cProfile ligado para as próximas {_profile_restantes} varreduras.")
+            elif msg.get("tipo") == "comando":
+                _ensure_cmd_worker()
+                try:
+                    _cmd_queue.put_nowait((msg["text"], msg["chat_id"]))
+                except queue.Full:
+                    logger.warning("⚠️ Fila de comandos cheia. Comando %s ignorado.", msg["text"])
+
+    threading.Thread(target=_consumir_fila, name="ipc-comandos", daemon=True).start()
+    start_settlement_worker()
+    main_loop()
+    salvar_estado()
+    _drenar_telegram()
+
+def rodar_processo_web(port: int) -> int:
+    """Processo principal em PROCESS_MODE=split: sobe o scanner e serve o app num WSGI multi-thread."""
+    global PROCESS_ROLE, _fila_scanner
+    from werkzeug.serving import make_server
+
+    PROCESS_ROLE = "web"
+    ctx = multiprocessing.get_context("spawn")
+    _fila_scanner = ctx.Queue(maxsize=COMMAND_QUEUE_MAX)
+    scanner = ctx.Process(target=rodar_processo_scanner, args=(_fila_scanner,), name="scanner")
+    scanner.start()
+    logger.info("🧩 Modo split: scanner pid=%s | web pid=%s porta %s.", scanner.pid, os.getpid(), port)
+
+    servidor = make_server("0.0.0.0", port, app, threaded=True)
+    web = threading.Thread(target=servidor.serve_forever, name="wsgi", daemon=True)
+    web.start()
+    signal.signal(signal.SIGTERM, _ao_sigterm)
+    signal.signal(signal.SIGINT, _ao_sigterm)
+
+    codigo = 0
+    while not _parar.wait(2.0):
+        if not scanner.is_alive():
+            logger.error("❌ Processo scanner terminou (exit=%s). Encerrando para o supervisor reiniciar.",
+                         scanner.exitcode)
+            codigo = 1
+            break
+    servidor.shutdown()
+    if scanner.is_alive():
+        scanner.terminate()                      # SIGTERM: o scanner fecha o tick e salva o snapshot
+        scanner.join(timeout=SCAN_INTERVAL_MAX)
+        if scanner.is_alive():
+            scanner.kill()
+    _drenar_telegram()
+    logger.info("⏹ Processo web encerrado.")
+    return codigo
+
 # =========================== START ============================
 if __name__ == "__main__":
+    if BOT_MODE == "replay":
+        rodar_replay()
+        sys.exit(0)
+
     logger.info("🚀 Iniciando Bot Escanteios RP VIP Plus — Multi v2 (Econômico) ULTRA Sensível v3.2.2 (NASA)")
     try:
         boot_msg = ("🤖 Bot VIP ULTRA ativo. Janela HT 29.8–42 | FT 69.8–93. "
@@ -1044,6 +3502,11 @@ if __name__ == "__main__":
     except Exception:
         pass
 
+    if PROCESS_MODE == "split":
+        sys.exit(rodar_processo_web(int(os.getenv("PORT", 10000))))
+
     t = threading.Thread(target=main_loop, daemon=True)
     t.start()
-    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 10000)), debug=False)
\ No newline at end of file
+    instalar_sigterm_processo_unico(t)
+    start_settlement_worker()
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 10000)), debug=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""
+Paridade da pontuação em lote (NumPy) com a escalar. Com BATCH_SCORING_MIN=1000 o caminho em
+lote quase nunca roda ao vivo; sem este teste ele poderia divergir sem ninguém ver.
+"""
+
+import pytest
+
+import bench
+import bot_escanteios_rp_vip_plus_multi_v2_economico as bot
+
+
+@pytest.mark.parametrize("seed", [7, 11, 2024])
+def test_lote_igual_ao_escalar(seed):
+    assert bench.verificar_paridade_lote(n=2000, seed=seed) == 0
+
+
+def test_lote_devolve_mesmas_estrategias_e_composite():
+    fixtures, metrics_list = bench.lote_sintetico(300, seed=3)
+    esperado = [bot.verificar_estrategias_vip(fx, m) for fx, m in zip(fixtures, metrics_list)]
+    assert bot.avaliar_lote_vip(fixtures, metrics_list) == esperado
+    assert any(estrategias for estrategias, _ in esperado)   # o lote sintético cobre sinais reais
+
+
+def test_lote_vazio():
+    assert bot.avaliar_lote_vip([], []) == []